@@ -0,0 +1,95 @@
+"""Cost of building a results export: CSV vs zipped CSV vs XLSX, streamed from SQLite.
+
+Fills a throwaway database with synthetic results, then streams them
+through the export writers into a temporary file. "py MiB" is the Python
+allocation peak while writing (openpyxl keeps its sheet in a temp file,
+which is not counted).
+
+    python -m benchmarks.bench_export --rows 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import RU_WORDS
+
+from bot.export import FORMATS, write_csv_zip_parts
+from bot.records import Result
+from bot.storage import INSERT_RESULT, SQLiteStore
+
+PARSER_UID = 'bench'
+
+WRITERS = dict(
+    FORMATS,
+    # a single zipped CSV part, as sent for large CSV exports
+    zip=lambda f, rows: write_csv_zip_parts(rows, 2**62, lambda: f, lambda f, number: None),
+)
+
+
+def fill(store: SQLiteStore, rows: int, seed: int):
+    rnd = random.Random(seed)
+    with store.conn:
+        store.conn.executemany(
+            INSERT_RESULT,
+            (
+                (PARSER_UID, *Result(
+                    keyword=rnd.choice(RU_WORDS),
+                    chat=f"Чат {rnd.randint(1, 50)}",
+                    sender=f"@user{rnd.randint(1, 10**6)}",
+                    datetime='2024-01-01 12:00:00',
+                    link=f"https://t.me/chat/{n}",
+                    text=" ".join(rnd.choices(RU_WORDS, k=rnd.randint(5, 40))),
+                ))
+                for n in range(rows)
+            ),
+        )
+
+
+def run_format(store: SQLiteStore, fmt: str) -> dict:
+    # written to an unnamed file, as a spilled export buffer would be
+    with tempfile.TemporaryFile() as f:
+        t0 = time.perf_counter()
+        WRITERS[fmt](f, store.iter_results(PARSER_UID))
+        elapsed = time.perf_counter() - t0
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+    # allocations are measured on a separate pass, tracing skews timings
+    with tempfile.TemporaryFile() as f:
+        tracemalloc.start()
+        WRITERS[fmt](f, store.iter_results(PARSER_UID))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'seconds': elapsed,
+        'size_mib': size / 1024 / 1024,
+        'peak_mib': peak / 1024 / 1024,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--formats", default=",".join(WRITERS))
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteStore(os.path.join(tmp, 'bench.sqlite3'))
+        fill(store, args.rows, args.seed)
+        print(f"{args.rows} rows")
+        header = f"{'fmt':>5} {'seconds':>8} {'rows/s':>9} {'file MiB':>9} {'py MiB':>7}"
+        print(header)
+        print("-" * len(header))
+        for fmt in args.formats.split(","):
+            r = run_format(store, fmt)
+            print(
+                f"{fmt:>5} {r['seconds']:>8.2f} {args.rows / r['seconds']:>9.0f} "
+                f"{r['size_mib']:>9.1f} {r['peak_mib']:>7.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Throughput of normalize_word plus the monitor matching pipeline.
+
+Runs offline against a synthetic (or replayed) corpus and reports
+messages/sec, p50/p99 per-message latency and memory allocations for
+every combination of keyword count, exclude count and parser count.
+
+    python -m benchmarks.bench_matching
+    python -m benchmarks.bench_matching --keywords 10,200 --parsers 1,20 --corpus chats.txt
+"""
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import EN_WORDS, RU_WORDS, load_corpus, percentile, synthetic_messages
+
+from bot.matching import KeywordMatcher, match_parsers, normalize_tokens
+from bot.text_utils import normalize_cache, normalize_cache_stats
+
+
+def make_parsers(count: int, keywords: int, excludes: int, seed: int) -> list[tuple]:
+    rnd = random.Random(seed)
+    vocab = RU_WORDS + EN_WORDS
+    parsers = []
+    for _ in range(count):
+        kws = []
+        for _ in range(keywords):
+            # roughly one keyword in five is a two-word phrase
+            size = 2 if rnd.random() < 0.2 else 1
+            kws.append(" ".join(rnd.sample(vocab, size)))
+        exclude = rnd.sample(vocab, min(excludes, len(vocab)))
+        parsers.append(({}, KeywordMatcher(kws, exclude)))
+    return parsers
+
+
+def run_case(messages, parsers) -> dict:
+    latencies = []
+    hits = 0
+    start = time.perf_counter()
+    for text in messages:
+        t0 = time.perf_counter_ns()
+        tokens = normalize_tokens(text)
+        hits += len(list(match_parsers(tokens, parsers)))
+        latencies.append(time.perf_counter_ns() - t0)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    # allocations are measured on a separate pass, tracing skews timings
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    for text in messages:
+        list(match_parsers(normalize_tokens(text), parsers))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks_after = sys.getallocatedblocks()
+
+    return {
+        'msg_per_sec': len(messages) / elapsed if elapsed else 0.0,
+        'p50_us': percentile(latencies, 0.50) / 1000,
+        'p99_us': percentile(latencies, 0.99) / 1000,
+        'hits': hits,
+        'peak_kib': peak / 1024,
+        'blocks_delta': blocks_after - blocks_before,
+    }
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--messages", type=int, default=20000)
+    ap.add_argument("--keywords", type=_int_list, default=[10, 50, 200])
+    ap.add_argument("--excludes", type=_int_list, default=[0, 20])
+    ap.add_argument("--parsers", type=_int_list, default=[1, 10])
+    ap.add_argument("--corpus", help="replay messages from a text/JSONL file")
+    ap.add_argument("--cold", action="store_true", help="clear the normalize cache before each case")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    messages = load_corpus(args.corpus) if args.corpus else synthetic_messages(args.messages, args.seed)
+    print(f"{len(messages)} messages")
+    header = f"{'kw':>5} {'excl':>5} {'prs':>4} {'msg/s':>10} {'p50 us':>8} {'p99 us':>8} {'hits':>7} {'peak KiB':>9} {'blocks':>7}"
+    print(header)
+    print("-" * len(header))
+    for keywords in args.keywords:
+        for excludes in args.excludes:
+            for count in args.parsers:
+                if args.cold:
+                    normalize_cache.clear()
+                parsers = make_parsers(count, keywords, excludes, args.seed)
+                r = run_case(messages, parsers)
+                print(
+                    f"{keywords:>5} {excludes:>5} {count:>4} {r['msg_per_sec']:>10.0f} "
+                    f"{r['p50_us']:>8.1f} {r['p99_us']:>8.1f} {r['hits']:>7} "
+                    f"{r['peak_kib']:>9.1f} {r['blocks_delta']:>7}"
+                )
+    print("normalize cache:", normalize_cache_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Cost of save_user_data at scale: legacy JSON rewrite vs the SQLite store.
+
+Each mode runs in its own process so peak RSS is not shared between them.
+"data MiB" is RSS with the dataset built, "save MiB" the Python allocation
+peak of one incremental save and "peak MiB" the process peak RSS.
+
+    python -m benchmarks.bench_save --users 10000
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import RU_WORDS
+
+
+def make_user_data(users: int, parsers: int, seed: int = 1) -> dict:
+    rnd = random.Random(seed)
+    data = {}
+    for uid in range(users):
+        data[str(100000 + uid)] = {
+            'subscription_expiry': rnd.randint(0, 2_000_000_000),
+            'recurring': False,
+            'reminder3_sent': False,
+            'reminder1_sent': False,
+            'inactive_notified': False,
+            'used_promos': ['DEMO'],
+            'chat_limit': 5,
+            'balance': round(rnd.random() * 5000, 2),
+            'billing_enabled': True,
+            'parsers': [
+                {
+                    'id': n + 1,
+                    'name': f'Парсер_{n + 1}',
+                    'chats': [rnd.randint(10**9, 2 * 10**9) for _ in range(5)],
+                    'keywords': rnd.sample(RU_WORDS, 10),
+                    'exclude_keywords': rnd.sample(RU_WORDS, 3),
+                    'status': 'active',
+                    'daily_price': 49.67,
+                }
+                for n in range(parsers)
+            ],
+        }
+    return data
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _legacy_save(data: dict, path: str):
+    # what save_user_data did before the SQLite store
+    data_copy = copy.deepcopy(data)
+    for u in data_copy.values():
+        for p in u.get('parsers', []):
+            p.pop('handler', None)
+            p.pop('event', None)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data_copy, f, ensure_ascii=False, indent=2)
+
+
+def run_mode(mode: str, users: int, parsers: int, rounds: int, queue):
+    data = make_user_data(users, parsers)
+    base_rss = _peak_rss_mib()
+    with tempfile.TemporaryDirectory() as tmp:
+        if mode == 'legacy':
+            path = os.path.join(tmp, 'user_data.json')
+            save = lambda: _legacy_save(data, path)  # noqa: E731
+        else:
+            from bot.storage import SQLiteStore
+
+            store = SQLiteStore(os.path.join(tmp, 'user_data.sqlite3'))
+            save = lambda: store.save(data)  # noqa: E731
+        t0 = time.perf_counter()
+        save()
+        first = time.perf_counter() - t0
+        timings = []
+        keys = list(data)
+        for i in range(rounds):
+            # a typical handler touches a single user between saves
+            data[keys[i % len(keys)]]['balance'] += 1
+            t0 = time.perf_counter()
+            save()
+            timings.append(time.perf_counter() - t0)
+        # Python-level allocation peak of one incremental save
+        data[keys[0]]['balance'] += 1
+        tracemalloc.start()
+        save()
+        _, save_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    timings.sort()
+    queue.put({
+        'mode': mode,
+        'first_ms': first * 1000,
+        'p50_ms': timings[len(timings) // 2] * 1000,
+        'max_ms': timings[-1] * 1000,
+        'data_rss_mib': base_rss,
+        'save_peak_mib': save_peak / 1024 / 1024,
+        'peak_rss_mib': _peak_rss_mib(),
+    })
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--parsers", type=int, default=2, help="parsers per user")
+    ap.add_argument("--rounds", type=int, default=20, help="incremental saves after the first one")
+    args = ap.parse_args(argv)
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{args.users} users x {args.parsers} parsers, {args.rounds} incremental saves")
+    header = (
+        f"{'mode':>7} {'first ms':>9} {'p50 ms':>8} {'max ms':>8} "
+        f"{'data MiB':>9} {'save MiB':>9} {'peak MiB':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for mode in ('legacy', 'sqlite'):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_mode, args=(mode, args.users, args.parsers, args.rounds, queue))
+        proc.start()
+        r = queue.get()
+        proc.join()
+        print(
+            f"{r['mode']:>7} {r['first_ms']:>9.1f} {r['p50_ms']:>8.1f} {r['max_ms']:>8.1f} "
+            f"{r['data_rss_mib']:>9.1f} {r['save_peak_mib']:>9.1f} {r['peak_rss_mib']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Helpers shared by the offline benchmarks.
+
+Benchmarks import bot modules directly, so a placeholder token is set
+before ``bot.config`` is imported; nothing here talks to Telegram.
+"""
+import os
+import random
+
+os.environ.setdefault("API_TOKEN", "123456:offline-benchmark")
+
+RU_WORDS = (
+    "привет купить продать квартира дом машина работа срочно нужен ищу "
+    "ремонт аренда снять сдать цена недорого доставка заказ услуга мастер "
+    "сантехник электрик юрист бухгалтер кредит ипотека дизайн сайт реклама "
+    "продвижение клиент менеджер офис склад грузчик переезд такси ребёнок "
+    "школа репетитор английский язык курс обучение помощь совет вопрос "
+    "спасибо сегодня завтра вечером утром москва питер район метро рядом"
+).split()
+
+EN_WORDS = (
+    "hello buy sell apartment house car job urgent need looking repair rent "
+    "price cheap delivery order service plumber lawyer loan mortgage design "
+    "website marketing client manager office moving taxi school tutor course "
+    "help advice question thanks today tomorrow evening morning near city"
+).split()
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def synthetic_messages(count: int, seed: int = 1) -> list[str]:
+    """Chat-like messages mixing Russian and English vocabulary."""
+    rnd = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        vocab = RU_WORDS if rnd.random() < 0.7 else EN_WORDS
+        words = rnd.choices(vocab, k=rnd.randint(3, 40))
+        if rnd.random() < 0.3:
+            # inflected forms exercise the morphology path
+            words = [w + rnd.choice(("а", "ы", "ом", "ами", "s", "ing")) for w in words]
+        messages.append(" ".join(words).capitalize() + rnd.choice((".", "!", "?", "")))
+    return messages
+
+
+def load_corpus(path: str) -> list[str]:
+    """Replay a corpus: one message per line, or JSONL with a ``text`` field."""
+    import json
+
+    messages = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get("text", "")
+            messages.append(line)
+    return messages
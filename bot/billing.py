@@ -1,24 +1,15 @@
 import asyncio
 from datetime import datetime, timedelta
 
-from .config import PRO_MONTHLY_RUB, EXTRA_CHAT_MONTHLY_RUB, DAYS_IN_MONTH, bot
-from .data import get_user_data_entry, user_data, save_user_data
+from .config import bot
+from .data import billable_user_ids, get_user_data_entry, user_data, save_user_data
+from .delivery import PAYMENT
+from .pricing import _round2, calc_parser_daily_cost
 from .utils import safe_send_message
-from .parsers import send_all_results
+from .parsers import send_all_results, start_export
 from .text_utils import t
 
 
-def _round2(x: float) -> float:
-    return float(f"{x:.2f}")
-
-
-def calc_parser_daily_cost(parser: dict) -> float:
-    chats = len(parser.get('chats', []))
-    base = PRO_MONTHLY_RUB / DAYS_IN_MONTH
-    extras = max(0, chats - 5) * (EXTRA_CHAT_MONTHLY_RUB / DAYS_IN_MONTH)
-    return _round2(base + extras)
-
-
 def total_daily_cost(user_id: int) -> float:
     data = user_data.get(str(user_id), {})
     total = 0.0
@@ -69,16 +60,19 @@ async def bill_user_daily(user_id: int):
                 bot,
                 user_id,
                 "⏸ Недостаточно средств. Все парсеры поставлены на паузу. Пополните баланс командой /topup.",
+                priority=PAYMENT,
             )
 
 
 async def daily_billing_loop():
     while True:
-        for uid in list(user_data.keys()):
+        for uid in billable_user_ids():
             try:
                 await bill_user_daily(int(uid))
             except Exception:
                 pass
+            # each record may be read from the database, let other tasks run
+            await asyncio.sleep(0)
         now = datetime.utcnow()
         tomorrow = (now + timedelta(days=1)).replace(hour=3, minute=0, second=0, microsecond=0)
         sleep_seconds = (tomorrow - now).total_seconds()
@@ -92,17 +86,17 @@ def check_subscription(user_id: int):
     days_left = (exp - now) // 86400
     if exp and days_left <= 0:
         if not data.get('inactive_notified'):
-            asyncio.create_task(send_all_results(user_id))
-            asyncio.create_task(safe_send_message(bot, user_id, t('subscription_inactive')))
+            asyncio.create_task(start_export(user_id, send_all_results(user_id)))
+            asyncio.create_task(safe_send_message(bot, user_id, t('subscription_inactive'), priority=PAYMENT))
             data['inactive_notified'] = True
             save_user_data(user_data)
         return
     if not data.get('recurring'):
         if days_left == 3 and not data.get('reminder3_sent'):
-            asyncio.create_task(safe_send_message(bot, user_id, t('subscription_reminder', days=3)))
+            asyncio.create_task(safe_send_message(bot, user_id, t('subscription_reminder', days=3), priority=PAYMENT))
             data['reminder3_sent'] = True
         elif days_left == 1 and not data.get('reminder1_sent'):
-            asyncio.create_task(safe_send_message(bot, user_id, t('subscription_reminder', days=1)))
+            asyncio.create_task(safe_send_message(bot, user_id, t('subscription_reminder', days=1), priority=PAYMENT))
             data['reminder1_sent'] = True
         if data.get('reminder3_sent') or data.get('reminder1_sent'):
             save_user_data(user_data)
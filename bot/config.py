@@ -38,6 +38,67 @@ DAYS_IN_MONTH = 30
 RETURN_URL = "https://t.me/TOPGrabber_bot"
 
 DATA_FILE = "user_data.json"
+DB_FILE = "user_data.sqlite3"
+# write-behind: saves are coalesced and written at most once per SAVE_INTERVAL seconds
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "1") != "0"
+SAVE_INTERVAL = float(os.getenv("SAVE_INTERVAL", "2"))
+# user records not looked up for USER_IDLE_TTL seconds are dropped from
+# memory after the next write and reloaded on demand
+USER_IDLE_TTL = int(os.getenv("USER_IDLE_TTL", "1800"))
 TEXT_FILE = "texts.json"
 
 CHAT_LIMIT = 5
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("NORMALIZE_CACHE_SIZE", "50000"))
+
+ENTITY_CACHE_DIR = "entity_cache"
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "5000"))
+ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", str(6 * 3600)))
+# changed entity caches are written to disk this often and at shutdown
+ENTITY_SAVE_INTERVAL = int(os.getenv("ENTITY_SAVE_INTERVAL", "60"))
+
+# exports are built in memory and spill to a temporary file past this size
+EXPORT_SPOOL_SIZE = int(os.getenv("EXPORT_SPOOL_SIZE", str(4 * 1024 * 1024)))
+# threads building export files, exports a user may have queued at once,
+# and how many rows between progress updates
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_JOBS_PER_USER = int(os.getenv("EXPORT_JOBS_PER_USER", "1"))
+EXPORT_PROGRESS_ROWS = int(os.getenv("EXPORT_PROGRESS_ROWS", "20000"))
+# CSV exports estimated over EXPORT_ZIP_SIZE bytes are zipped, split into parts
+# of about EXPORT_PART_SIZE bytes, below Telegram's 50 MB upload limit
+EXPORT_ZIP_SIZE = int(os.getenv("EXPORT_ZIP_SIZE", str(5 * 1024 * 1024)))
+EXPORT_PART_SIZE = int(os.getenv("EXPORT_PART_SIZE", str(45 * 1024 * 1024)))
+
+# safe_send_message remembers whether a recipient is a human, a bot or has
+# blocked us; blocked entries expire sooner so unblocking is noticed
+RECIPIENT_CACHE_SIZE = int(os.getenv("RECIPIENT_CACHE_SIZE", "100000"))
+RECIPIENT_TTL = int(os.getenv("RECIPIENT_TTL", str(24 * 3600)))
+RECIPIENT_BLOCKED_TTL = int(os.getenv("RECIPIENT_BLOCKED_TTL", "600"))
+
+# outbound Bot API calls, per bot: messages per second overall and per chat,
+# calls waiting at most (per priority class), sender workers and RetryAfter
+# retries per call; lead notifications leave DELIVERY_BULK_RESERVE of the
+# per-second budget to payments and UI
+DELIVERY_RATE = float(os.getenv("DELIVERY_RATE", "25"))
+DELIVERY_CHAT_RATE = float(os.getenv("DELIVERY_CHAT_RATE", "1"))
+DELIVERY_QUEUE_SIZE = int(os.getenv("DELIVERY_QUEUE_SIZE", "10000"))
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "4"))
+DELIVERY_MAX_RETRIES = int(os.getenv("DELIVERY_MAX_RETRIES", "5"))
+DELIVERY_BULK_RESERVE = float(os.getenv("DELIVERY_BULK_RESERVE", "5"))
+# lead notifications waiting for one chat; past that the oldest is dropped so
+# one flooded chat can't fill the queue for everyone else
+DELIVERY_CHAT_QUEUE_SIZE = int(os.getenv("DELIVERY_CHAT_QUEUE_SIZE", "20"))
+
+# parsers in digest mode send their hits as one message after DIGEST_HITS hits
+# or DIGEST_SECONDS seconds; DIGEST_MAX_LENGTH is Telegram's message limit
+DIGEST_HITS = int(os.getenv("DIGEST_HITS", "10"))
+DIGEST_SECONDS = int(os.getenv("DIGEST_SECONDS", "300"))
+DIGEST_MAX_LENGTH = 4096
+
+# while the notifications bot can't reach a user, up to NOTIFY_BACKLOG_SIZE
+# hits are kept for them, the main bot reminds at most once per
+# NOTIFY_REMIND_INTERVAL seconds and delivery is retried every
+# NOTIFY_RETRY_INTERVAL seconds
+NOTIFY_BACKLOG_SIZE = int(os.getenv("NOTIFY_BACKLOG_SIZE", "500"))
+NOTIFY_REMIND_INTERVAL = int(os.getenv("NOTIFY_REMIND_INTERVAL", str(6 * 3600)))
+NOTIFY_RETRY_INTERVAL = int(os.getenv("NOTIFY_RETRY_INTERVAL", "300"))
@@ -1,60 +1,206 @@
-import json
-import os
-import copy
+import asyncio
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from .config import DATA_FILE, CHAT_LIMIT
+from .config import DATA_FILE, DB_FILE, SAVE_INTERVAL, USER_IDLE_TTL, WRITE_BEHIND
+from .migrations import SCHEMA_VERSION, migrate_user, new_user
+from .records import Result
+from .storage import SQLiteStore, UserRepository, parser_uid
+
+store = SQLiteStore(DB_FILE)
+# every database write goes through this single thread, in order
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-data-writer")
+_pending = None
+_flush_task = None
+
+
+def run_migrations():
+    """Upgrade stored records to SCHEMA_VERSION once and persist them."""
+    if store.schema_version() >= SCHEMA_VERSION:
+        return
+    ops = []
+    count = 0
+    for user_id in store.user_ids():
+        user = store.load_user(user_id)
+        if migrate_user(user):
+            count += 1
+            ops.extend(store.prepare({user_id: user}))
+    # committed together with the upgraded rows
+    ops.append((f"PRAGMA user_version = {SCHEMA_VERSION}", ()))
+    store.apply(ops)
+    logging.info("Migrated %d users to schema version %d", count, SCHEMA_VERSION)
 
 
 def load_user_data():
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            from .billing import calc_parser_daily_cost  # local import to avoid circular
-            for u in data.values():
-                u.setdefault('subscription_expiry', 0)
-                u.setdefault('recurring', False)
-                u.setdefault('reminder3_sent', False)
-                u.setdefault('reminder1_sent', False)
-                u.setdefault('inactive_notified', False)
-                u.setdefault('used_promos', [])
-                u.setdefault('chat_limit', CHAT_LIMIT)
-                u.setdefault('balance', 0.0)
-                u.setdefault('billing_enabled', True)
-                for p in u.get('parsers', []):
-                    p.setdefault('results', [])
-                    p.setdefault('name', 'Без названия')
-                    p.setdefault('api_id', '')
-                    p.setdefault('api_hash', '')
-                    p.setdefault('status', 'paused')
-                    p.setdefault('daily_price', 0.0)
-                    if not p.get('daily_price'):
-                        p['daily_price'] = calc_parser_daily_cost(p)
-            return data
-        except Exception:
-            logging.exception("Failed to load user data")
-    return {}
+    """Open the user repository; records are loaded on first access."""
+    try:
+        store.migrate_json(DATA_FILE)
+    except Exception:
+        logging.exception("Failed to migrate %s", DATA_FILE)
+    try:
+        run_migrations()
+    except Exception:
+        logging.exception("Failed to upgrade stored user data")
+    return UserRepository(store)
+
+
+def _snapshot(data) -> tuple:
+    """What to save, taken on the event loop: the loaded records and deleted ids.
+
+    Only the mapping is copied; the records are dumped and diffed later in
+    the writer thread, see ``_write``.
+    """
+    if isinstance(data, UserRepository):
+        return dict(data.loaded), data.pop_deleted()
+    return dict(data), set()
+
+
+def _write(users: dict, deleted: set):
+    store.apply(store.prepare(users, deleted))
 
 
 def save_user_data(data):
+    """Persist ``data``; with write-behind running this only marks it dirty."""
+    global _pending
+    if _flush_task is not None and not _flush_task.done():
+        _pending = data
+        return
     try:
-        data_copy = copy.deepcopy(data)
-        for u in data_copy.values():
-            for p in u.get('parsers', []):
-                p.pop('handler', None)
-                p.pop('event', None)
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data_copy, f, ensure_ascii=False, indent=2)
+        _writer.submit(_write, *_snapshot(data)).result()
     except Exception:
         logging.exception("Failed to save user data")
 
 
+async def flush_user_data():
+    """Write the pending snapshot, if any, without blocking the event loop."""
+    global _pending
+    data, _pending = _pending, None
+    if data is None:
+        return
+    started = time.monotonic()
+    try:
+        await asyncio.get_running_loop().run_in_executor(_writer, _write, *_snapshot(data))
+    except Exception:
+        logging.exception("Failed to save user data")
+        return
+    if isinstance(data, UserRepository):
+        # everything loaded was just written, idle records can go
+        evicted = data.evict(started - USER_IDLE_TTL)
+        if evicted:
+            _writer.submit(store.forget, evicted).add_done_callback(_log_write_error)
+
+
+async def _flush_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        await flush_user_data()
+
+
+def start_write_behind(interval: float = SAVE_INTERVAL):
+    """Coalesce save_user_data calls into at most one write per ``interval``."""
+    global _flush_task
+    if WRITE_BEHIND and _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop(interval))
+
+
+async def stop_write_behind():
+    global _flush_task
+    task, _flush_task = _flush_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await flush_user_data()
+    # wait for a write that was in flight when the task was cancelled
+    await wait_for_writes()
+
+
+def _log_write_error(future):
+    if future.exception() is not None:
+        logging.error("Failed to write to the database", exc_info=future.exception())
+
+
+async def wait_for_writes():
+    """Wait until every write queued so far is committed."""
+    await asyncio.get_running_loop().run_in_executor(_writer, lambda: None)
+
+
+def append_result(parser: dict, result: Result):
+    _writer.submit(store.append_result, parser_uid(parser), result).add_done_callback(_log_write_error)
+
+
+def clear_results(ranges):
+    """Delete the results an export of ``ranges`` covered, see export_ranges."""
+    for uid, _, upto in ranges:
+        _writer.submit(store.clear_results, uid, upto).add_done_callback(_log_write_error)
+
+
+def export_ranges(parsers, new_only: bool = False) -> list:
+    """What an export of ``parsers`` covers, as (parser uid, after id, up to id).
+
+    The upper bound is fixed here, so results found while the file is being
+    built go to the next export. ``new_only`` starts after each parser's
+    ``export_cursor``, the last result id already exported.
+    """
+    ranges = []
+    for p in parsers:
+        uid = parser_uid(p)
+        after = p.get('export_cursor', 0) if new_only else 0
+        ranges.append((uid, after, store.last_result_id(uid)))
+    return ranges
+
+
+def has_results(ranges, filters=None) -> bool:
+    return store.has_results(ranges, filters)
+
+
+def count_results(ranges, reader=None, filters=None) -> int:
+    return store.count_results(ranges, reader, filters)
+
+
+def measure_results(ranges, reader=None, filters=None) -> tuple[int, int]:
+    return store.measure_results(ranges, reader, filters)
+
+
+def iter_results(ranges, reader=None, filters=None):
+    """Stream the results of ``ranges`` in order, as Result records."""
+    for uid, after, upto in ranges:
+        yield from store.iter_results(uid, reader, after, upto, filters)
+
+
+def billable_user_ids() -> set:
+    """Users with an active parser, the only ones daily billing charges."""
+    ids = set(store.active_user_ids())
+    # loaded records may be newer than what is stored
+    for user_id, user in list(user_data.loaded.items()):
+        if any(p.get('status') == 'active' for p in user.get('parsers', [])):
+            ids.add(user_id)
+        else:
+            ids.discard(user_id)
+    return ids
+
+
+def open_reader():
+    return store.open_reader()
+
+
+def record_payment(payment_id: str, user_id: int, amount: str, description: str):
+    _writer.submit(store.record_payment, payment_id, user_id, amount, description).add_done_callback(_log_write_error)
+
+
+def update_payment_status(payment_id: str, status: str):
+    _writer.submit(store.update_payment_status, payment_id, status).add_done_callback(_log_write_error)
+
+
 user_data = load_user_data()
 
 
 def get_user_data_entry(user_id: int):
-    data = user_data.setdefault(str(user_id), {})
-    data.setdefault('chat_limit', CHAT_LIMIT)
-    data.setdefault('balance', 0.0)
+    key = str(user_id)
+    data = user_data.get(key)
+    if data is None:
+        data = user_data[key] = new_user()
     return data
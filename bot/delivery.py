@@ -0,0 +1,261 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from aiogram.utils.exceptions import RetryAfter
+
+from .cache import LRUCache
+from .config import (
+    DELIVERY_BULK_RESERVE,
+    DELIVERY_CHAT_QUEUE_SIZE,
+    DELIVERY_CHAT_RATE,
+    DELIVERY_MAX_RETRIES,
+    DELIVERY_QUEUE_SIZE,
+    DELIVERY_RATE,
+    DELIVERY_WORKERS,
+)
+
+# priority classes, most urgent first: payment and billing notices, replies
+# to the user's own actions, lead notifications
+PAYMENT, INTERACTIVE, BULK = range(3)
+PRIORITIES = (PAYMENT, INTERACTIVE, BULK)
+
+
+class Dropped(Exception):
+    """A queued call was dropped to make room, see ``Outbox.chat_queue_size``."""
+
+
+class TokenBucket:
+    """``rate`` tokens per second, at most ``capacity`` saved up."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, keep: float = 0) -> float:
+        """Seconds until a token can be taken leaving ``keep`` tokens behind."""
+        self._refill()
+        missing = keep + 1 - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def reserve(self) -> float:
+        """Take a token; returns how many seconds to wait before using it."""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Outbox:
+    """Rate-limited delivery of Bot API calls for one bot.
+
+    Calls wait in a FIFO lane per chat. A chat is handed to a worker once
+    its own interval (``chat_rate``) has passed, and only one call per chat
+    is in flight, so messages to a chat keep their order and one busy chat
+    does not hold up the others. All workers share the bot-wide token
+    bucket. ``RetryAfter`` puts the call back at the head of its lane for
+    the time Telegram asks. ``queue_size`` bounds the calls waiting;
+    ``send`` blocks while the outbox is full.
+
+    Each call has a priority class. Workers take the most urgent ready lane
+    first and every class has its own lanes and queue bound, so a flood of
+    lead notifications neither delays nor blocks a payment notice or a
+    menu. The per-chat interval and the one call in flight apply across
+    classes: a class only decides which call a chat gets next. ``BULK``
+    calls also back off under pressure: they only go out
+    while ``bulk_reserve`` tokens stay in the bucket for the other classes,
+    and a ``RetryAfter`` on any call holds all bulk lanes for its duration.
+    At most ``chat_queue_size`` bulk calls wait per chat: the oldest waiting
+    one fails with ``Dropped`` when another arrives, so a chat flooded with
+    hits can't use up the class bound that every other chat shares.
+    """
+
+    def __init__(
+        self,
+        rate: float = DELIVERY_RATE,
+        chat_rate: float = DELIVERY_CHAT_RATE,
+        queue_size: int = DELIVERY_QUEUE_SIZE,
+        workers: int = DELIVERY_WORKERS,
+        max_retries: int = DELIVERY_MAX_RETRIES,
+        bulk_reserve: float = DELIVERY_BULK_RESERVE,
+        chat_queue_size: int = DELIVERY_CHAT_QUEUE_SIZE,
+    ):
+        self.bucket = TokenBucket(rate, rate)
+        self.bulk_reserve = min(bulk_reserve, rate - 1)
+        self.chat_interval = 1 / chat_rate
+        self.queue_size = queue_size
+        self.chat_queue_size = chat_queue_size
+        self.workers = workers
+        self.max_retries = max_retries
+        # (priority, chat_id) -> deque of [call, future, attempts]
+        self.lanes = {}
+        # chat_id -> monotonic time the chat may be sent to again
+        self.chat_next = LRUCache(100000)
+        # chat_id -> key of the lane with a call in flight, and lane keys
+        # waiting for the chat
+        self.busy = {}
+        self.parked = {}
+        # priority -> heap of (ready_at, seq, lane key) waiting for a worker
+        self.ready = {priority: [] for priority in PRIORITIES}
+        self.seq = itertools.count()
+        # monotonic time bulk lanes may resume after a RetryAfter
+        self.bulk_hold = 0.0
+        self.slots = {}
+        self.changed = None
+        self.tasks = []
+
+    def _start(self):
+        self.slots = {priority: asyncio.Semaphore(self.queue_size) for priority in PRIORITIES}
+        self.changed = asyncio.Event()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _schedule(self, key, ready_at: float):
+        heapq.heappush(self.ready[key[0]], (ready_at, next(self.seq), key))
+        self.changed.set()
+
+    async def send(self, chat_id: int, call, priority: int = INTERACTIVE):
+        """Run ``call()`` (a coroutine function making one API call) and return its result."""
+        if not self.tasks:
+            self._start()
+        slots = self.slots[priority]
+        await slots.acquire()
+        future = asyncio.get_running_loop().create_future()
+        key = (priority, chat_id)
+        lane = self.lanes.get(key)
+        if lane is None:
+            lane = self.lanes[key] = deque()
+            self._schedule(key, self.chat_next.get(chat_id, 0))
+        elif priority == BULK:
+            # the head of the lane may be in flight already
+            first = 1 if self.busy.get(chat_id) == key else 0
+            if len(lane) - first >= self.chat_queue_size:
+                dropped = lane[first][1]
+                del lane[first]
+                if not dropped.done():
+                    dropped.set_exception(Dropped(f"chat {chat_id} has {self.chat_queue_size} calls waiting"))
+        lane.append([call, future, 0])
+        try:
+            return await future
+        finally:
+            slots.release()
+
+    def _hold(self, priority: int) -> float:
+        """Seconds the class must wait for the bucket before its next call."""
+        if priority != BULK:
+            return 0.0
+        return max(self.bulk_hold - time.monotonic(), self.bucket.wait_time(self.bulk_reserve))
+
+    async def _next_lane(self):
+        while True:
+            self.changed.clear()
+            delay = None
+            now = time.monotonic()
+            for priority in PRIORITIES:
+                ready = self.ready[priority]
+                while ready:
+                    ready_at, _, key = ready[0]
+                    chat_id = key[1]
+                    if chat_id in self.busy:
+                        # rescheduled by _release once the chat is free
+                        heapq.heappop(ready)
+                        self.parked.setdefault(chat_id, []).append(key)
+                    elif self.chat_next.get(chat_id, 0) > ready_at:
+                        # another class has sent to the chat since
+                        heapq.heapreplace(ready, (self.chat_next.get(chat_id), next(self.seq), key))
+                    else:
+                        break
+                if not ready:
+                    continue
+                wait = max(ready[0][0] - now, self._hold(priority))
+                if wait <= 0:
+                    key = heapq.heappop(ready)[2]
+                    self.busy[key[1]] = key
+                    return key
+                delay = wait if delay is None else min(delay, wait)
+            try:
+                await asyncio.wait_for(self.changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            key = await self._next_lane()
+            chat_id = key[1]
+            lane = self.lanes[key]
+            job = lane[0]
+            call, future, attempts = job
+            ready_at = time.monotonic() + self.chat_interval
+            done = True
+            if not future.cancelled():
+                delay = self.bucket.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+                try:
+                    result = await call()
+                except RetryAfter as e:
+                    if attempts < self.max_retries:
+                        logging.warning("Flood limit for chat %s, retry in %ss", chat_id, e.timeout)
+                        job[2] += 1
+                        ready_at = time.monotonic() + e.timeout
+                        self.bulk_hold = max(self.bulk_hold, ready_at)
+                        done = False
+                    elif not future.done():
+                        future.set_exception(e)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            if done:
+                lane.popleft()
+            self._release(chat_id, ready_at)
+            if lane:
+                self._schedule(key, ready_at)
+            else:
+                del self.lanes[key]
+
+    def _release(self, chat_id, ready_at: float):
+        self.busy.pop(chat_id, None)
+        self.chat_next.set(chat_id, ready_at)
+        for key in self.parked.pop(chat_id, ()):
+            self._schedule(key, ready_at)
+
+    async def close(self, timeout: float = 10):
+        """Give queued calls up to ``timeout`` seconds, then stop the workers."""
+        deadline = time.monotonic() + timeout
+        while self.lanes and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+
+# bot id -> Outbox
+outboxes = {}
+
+
+def get_outbox(bot) -> Outbox:
+    outbox = outboxes.get(bot.id)
+    if outbox is None:
+        outbox = outboxes[bot.id] = Outbox()
+    return outbox
+
+
+async def deliver(bot, chat_id: int, call, priority: int = INTERACTIVE):
+    """Send through ``bot``'s outbox: ``call`` is e.g. ``lambda: bot.send_message(...)``."""
+    return await get_outbox(bot).send(chat_id, call, priority)
+
+
+async def close_outboxes(timeout: float = 10):
+    await asyncio.gather(*(outbox.close(timeout) for outbox in outboxes.values()))
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import os
+
+from telethon import utils as tl_utils
+
+from .cache import TTLCache
+from .config import ENTITY_CACHE_DIR, ENTITY_CACHE_SIZE, ENTITY_CACHE_TTL, ENTITY_SAVE_INTERVAL
+
+
+def _record(entity) -> dict:
+    """The few entity fields the bot needs, small enough to persist."""
+    return {
+        'id': entity.id,
+        'peer_id': tl_utils.get_peer_id(entity),
+        'title': getattr(entity, 'title', None),
+        'username': getattr(entity, 'username', None),
+        'first_name': getattr(entity, 'first_name', None),
+        'bot': bool(getattr(entity, 'bot', False)),
+    }
+
+
+def _ref_key(ref) -> str | None:
+    """Cache key for a user supplied chat link, ``None`` for numeric ids."""
+    ref = str(ref).strip()
+    if ref.lstrip('-').isdigit():
+        return None
+    for prefix in ('https://', 'http://'):
+        if ref.startswith(prefix):
+            ref = ref[len(prefix):]
+    for prefix in ('t.me/', 'telegram.me/'):
+        if ref.startswith(prefix):
+            ref = ref[len(prefix):]
+    if ref.startswith(('+', 'joinchat/')):
+        return f"link:{ref}"
+    return '@' + ref.lstrip('@').split('/')[0].lower()
+
+
+class EntityCache:
+    """Chat and sender records of one Telethon client.
+
+    Records are keyed by marked peer id and by ``@username``, expire after
+    ``ENTITY_CACHE_TTL`` and are kept on disk so a restart does not have to
+    resolve every chat again. The file is written by ``entity_save_loop``,
+    never from the message handlers.
+    """
+
+    def __init__(self, path: str, maxsize: int = ENTITY_CACHE_SIZE, ttl: float = ENTITY_CACHE_TTL):
+        self.path = path
+        self.records = TTLCache(maxsize, ttl)
+        self.dirty = False
+
+    def put(self, entity, ref=None) -> dict:
+        record = _record(entity)
+        self.records.set(record['peer_id'], record)
+        if record['username']:
+            self.records.set('@' + record['username'].lower(), record)
+        if ref is not None:
+            # a numeric ref is kept as given, it may not be the marked id
+            key = _ref_key(ref)
+            self.records.set(key if key else int(ref), record)
+        self.dirty = True
+        return record
+
+    async def resolve(self, client, ref) -> dict:
+        """Record for a chat link, username or id; raises if it can't be found."""
+        key = _ref_key(ref)
+        record = self.records.get(key if key else int(ref))
+        if record is None:
+            target = int(ref) if key is None else ref
+            record = self.put(await client.get_entity(target), ref)
+        return record
+
+    async def chat(self, event) -> dict | None:
+        record = self.records.get(event.chat_id)
+        if record is None:
+            chat = event.chat or await event.get_chat()
+            record = self.put(chat) if chat is not None else None
+        return record
+
+    async def sender(self, event) -> dict | None:
+        if event.sender_id is None:
+            return None
+        record = self.records.get(event.sender_id)
+        if record is None:
+            # entities delivered with the update are already attached to the event
+            sender = event.sender or await event.get_sender()
+            record = self.put(sender) if sender is not None else None
+        return record
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for key, expires_at, record in entries:
+                self.records.set(key, record, expires_at)
+        except Exception:
+            logging.exception("Failed to load entity cache %s", self.path)
+        return self
+
+    def _write(self, entries: list):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    async def save(self):
+        """Write the records to disk in a worker thread if they changed."""
+        if not self.dirty:
+            return
+        entries = list(self.records.items())
+        self.dirty = False
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, entries)
+        except Exception:
+            self.dirty = True
+            logging.exception("Failed to save entity cache %s", self.path)
+
+
+entity_caches = {}
+
+
+def get_entity_cache(user_id: int) -> EntityCache:
+    cache = entity_caches.get(user_id)
+    if cache is None:
+        path = os.path.join(ENTITY_CACHE_DIR, f"{user_id}.json")
+        cache = entity_caches[user_id] = EntityCache(path).load()
+    return cache
+
+
+async def save_entity_caches():
+    await asyncio.gather(*(cache.save() for cache in list(entity_caches.values())))
+
+
+async def entity_save_loop(interval: float = ENTITY_SAVE_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        await save_entity_caches()
+
+
+async def resolve_chat_ids(user_id: int, client, parts) -> list[int] | None:
+    """Resolve chat links to ids via the cache; ``None`` if one is not found."""
+    cache = get_entity_cache(user_id)
+    records = await asyncio.gather(
+        *(cache.resolve(client, part) for part in parts),
+        return_exceptions=True,
+    )
+    chat_ids = []
+    for part, record in zip(parts, records):
+        if not isinstance(record, BaseException):
+            chat_ids.append(record['id'])
+        elif part.lstrip("-").isdigit():
+            chat_ids.append(int(part))
+        else:
+            return None
+    return chat_ids
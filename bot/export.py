@@ -0,0 +1,88 @@
+import csv
+import io
+import zipfile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from .records import Result
+
+XLSX_SHEET = "Результаты"
+
+
+def _csv_row(result: Result) -> Result:
+    return result._replace(text=(result.text or '').replace('\n', ' '))
+
+
+def write_csv(f, rows):
+    """Stream Result ``rows`` into binary file ``f`` as CSV."""
+    text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+    try:
+        writer = csv.writer(text)
+        writer.writerow(Result._fields)
+        for result in rows:
+            writer.writerow(_csv_row(result))
+        text.flush()
+    finally:
+        # leave ``f`` open for the upload
+        text.detach()
+
+
+def write_csv_zip_parts(rows, part_size: int, new_file, part_done):
+    """Stream Result ``rows`` as zipped CSV, starting a new archive every ``part_size`` bytes.
+
+    ``new_file()`` returns an empty binary file for the next part and
+    ``part_done(f, number)`` is called once that part is complete, before the
+    next one starts, so only one part exists at a time. Compressed output is
+    flushed in blocks, so a part can end up slightly over ``part_size``.
+    """
+    rows = iter(rows)
+    result = next(rows, None)
+    number = 0
+    while number == 0 or result is not None:
+        number += 1
+        f = new_file()
+        with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            # force_zip64: the entry size is not known in advance
+            with zf.open(f"results_part{number}.csv", 'w', force_zip64=True) as entry:
+                text = io.TextIOWrapper(entry, encoding='utf-8', newline='')
+                writer = csv.writer(text)
+                writer.writerow(Result._fields)
+                while result is not None and f.tell() < part_size:
+                    writer.writerow(_csv_row(result))
+                    result = next(rows, None)
+                text.flush()
+                text.detach()
+        part_done(f, number)
+
+
+def _xlsx_value(ws, value):
+    value = ILLEGAL_CHARACTERS_RE.sub('', value or '')
+    if value.startswith('='):
+        # message text, not a formula
+        cell = WriteOnlyCell(ws, value)
+        cell.data_type = 's'
+        return cell
+    return value
+
+
+def write_xlsx(f, rows):
+    """Stream Result ``rows`` into binary file ``f`` as an XLSX workbook.
+
+    A write-only workbook serializes each row as it is appended, so the
+    sheet is never held in memory as cell objects.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(XLSX_SHEET)
+    ws.append(Result._fields)
+    for result in rows:
+        ws.append([_xlsx_value(ws, value) for value in result])
+    wb.save(f)
+
+
+# format -> writer
+FORMATS = {
+    'csv': write_csv,
+    'xlsx': write_xlsx,
+}
@@ -1,6 +1,4 @@
 import asyncio
-import os
-import csv
 import html
 from datetime import datetime, timedelta
 from aiogram import types
@@ -14,15 +12,18 @@ from telethon.errors import (
     FloodWaitError,
 )
 
-from .config import dp, bot
-from .states import PromoStates, ParserStates, EditParserStates, ExpandProStates, TopUpStates, PartnerTransferStates
-from .utils import ui_send_new, ui_from_callback_edit, safe_send_message, get_or_create_user_entry
-from .data import user_data, get_user_data_entry, save_user_data
+from .config import dp, bot, bot2, DIGEST_HITS, DIGEST_SECONDS
+from .states import PromoStates, ParserStates, EditParserStates, ExpandProStates, TopUpStates, PartnerTransferStates, ExportStates
+from .delivery import PAYMENT
+from .utils import ui_send_new, ui_from_callback_edit, safe_send_message, get_or_create_user_entry, mark_reachable
+from .data import user_data, get_user_data_entry, save_user_data, export_ranges, has_results, wait_for_writes
 from .text_utils import t, INFO_TEXT, HELP_TEXT, normalize_word
 from .payments import create_topup_payment, wait_topup_and_credit, create_pro_payment, wait_payment_and_activate, check_payment
 from .billing import total_daily_cost, predict_block_date, _round2, check_subscription
+from .pricing import calc_parser_daily_cost
 from .keyboards import main_menu_keyboard, parser_settings_keyboard
-from .parsers import pause_parser, resume_parser, parser_info_text, start_monitor, send_all_results, send_parser_results, user_clients
+from .entities import resolve_chat_ids
+from .parsers import pause_parser, resume_parser, parser_info_text, start_monitor, send_all_results, send_results, send_and_clear_results, send_and_delete_parser, start_export, reset_export_cursors, flush_digest, redeliver_notifications, is_monitored, user_clients
 
 @dp.message_handler(commands=["help"])
 async def cmd_help(message: types.Message):
@@ -101,6 +102,9 @@ def parser_settings_keyboard(idx: int) -> types.InlineKeyboardMarkup:
         types.InlineKeyboardButton("📂 Изменить слова", callback_data=f"edit_keywords_{idx}"),
         types.InlineKeyboardButton("📂 Изменить искл-слова", callback_data=f"edit_exclude_{idx}"),
     )
+    kb.add(
+        types.InlineKeyboardButton("📬 Уведомления: сводкой / сразу", callback_data=f"parser_digest_{idx}"),
+    )
     kb.add(
         types.InlineKeyboardButton("🗑 Удалить (только на паузе)", callback_data=f"parser_delete_{idx}"),
     )
@@ -147,6 +151,29 @@ async def cb_parser_resume(call: types.CallbackQuery):
     await ui_from_callback_edit(call, "▶️ Парсер запущен.")
 
 
+@dp.callback_query_handler(lambda c: c.data.startswith('parser_digest_'))
+async def cb_parser_digest(call: types.CallbackQuery):
+    idx = int(call.data.split('_')[2]) - 1
+    user_id = call.from_user.id
+    data = user_data.get(str(user_id), {})
+    if not data or idx < 0 or idx >= len(data.get('parsers', [])):
+        await call.answer("Не найдено", show_alert=True)
+        return
+    p = data['parsers'][idx]
+    if p.get('notify_mode') == 'digest':
+        p['notify_mode'] = 'instant'
+        flush_digest(p)
+        text = t('digest_off')
+    else:
+        p['notify_mode'] = 'digest'
+        text = t('digest_on').format(
+            hits=p.get('digest_hits', DIGEST_HITS),
+            minutes=p.get('digest_seconds', DIGEST_SECONDS) // 60,
+        )
+    save_user_data(user_data)
+    await call.answer(text, show_alert=True)
+
+
 @dp.callback_query_handler(lambda c: c.data.startswith('parser_delete_'))
 async def cb_parser_delete(call: types.CallbackQuery):
     idx = int(call.data.split('_')[2]) - 1
@@ -160,11 +187,9 @@ async def cb_parser_delete(call: types.CallbackQuery):
         await ui_from_callback_edit(call, "Удалять можно только парсеры на паузе. Сначала нажмите ⏸ Пауза.")
         await call.answer()
         return
-    stop_monitor(user_id, p)
-    await send_parser_results(user_id, idx)  # как и раньше — отдадим CSV перед удалением
-    data['parsers'].pop(idx)
-    save_user_data(user_data)
-    await ui_from_callback_edit(call, "🗑 Парсер удалён.")
+    # как и раньше — отдадим CSV перед удалением
+    if await start_export(user_id, send_and_delete_parser(user_id, p, idx + 1)):
+        await ui_from_callback_edit(call, t('parser_deleting'))
     await call.answer()
 
 
@@ -222,7 +247,8 @@ async def bill_user_daily(user_id: int):
             await safe_send_message(
                 bot,
                 user_id,
-                "⏸ Недостаточно средств. Все парсеры поставлены на паузу. Пополните баланс командой /topup."
+                "⏸ Недостаточно средств. Все парсеры поставлены на паузу. Пополните баланс командой /topup.",
+                priority=PAYMENT,
             )
 
 async def daily_billing_loop():
@@ -255,8 +281,9 @@ def parser_info_text(user_id: int, parser: dict, created: bool = False) -> str:
     else:
         paid_to = '—'
     chat_limit = f"/{data.get('chat_limit', CHAT_LIMIT)}" if plan_name == 'PRO' else ''
-    status_emoji = '🟢' if parser.get('handler') else '⏸'
-    status_text = 'Активен' if parser.get('handler') else 'Остановлен'
+    monitored = is_monitored(user_id, parser)
+    status_emoji = '🟢' if monitored else '⏸'
+    status_text = 'Активен' if monitored else 'Остановлен'
     if created:
         return t('parser_created', id=idx)
     return t(
@@ -297,18 +324,13 @@ async def cmd_menu(message: types.Message, state: FSMContext):
 @dp.message_handler(commands=['result'])
 async def cmd_result(message: types.Message):
     """Отправить последнюю таблицу результатов."""
-    await send_all_results(message.from_user.id)
+    await start_export(message.from_user.id, send_all_results(message.from_user.id))
 
 
 @dp.message_handler(commands=['clear_result'])
 async def cmd_clear_result(message: types.Message):
     """Отправить последнюю таблицу и очистить её."""
-    await send_all_results(message.from_user.id)
-    data = user_data.get(str(message.from_user.id))
-    if data:
-        for parser in data.get('parsers', []):
-            parser['results'] = []
-        save_user_data(user_data)
+    await start_export(message.from_user.id, send_and_clear_results(message.from_user.id))
 
 
 @dp.message_handler(commands=['delete_card'])
@@ -367,7 +389,6 @@ async def cb_delp_cancel(call: types.CallbackQuery):
 async def cb_delp_confirm(call: types.CallbackQuery):
     idx = int(call.data.split('_')[2])
     user_id = call.from_user.id
-    await send_parser_results(user_id, idx)
     data = user_data.get(str(user_id))
     if data and 0 <= idx < len(data.get('parsers', [])):
         parser = data['parsers'][idx]
@@ -375,10 +396,8 @@ async def cb_delp_confirm(call: types.CallbackQuery):
             await ui_from_callback_edit(call, "Оплаченный парсер нельзя удалить.")
             await call.answer()
             return
-        stop_monitor(user_id, parser)
-        data['parsers'].pop(idx)
-        save_user_data(user_data)
-        await ui_from_callback_edit(call, "Парсер удалён.")
+        if await start_export(user_id, send_and_delete_parser(user_id, parser, idx + 1)):
+            await ui_from_callback_edit(call, t('parser_deleting'))
     await ui_from_callback_edit(call, t('menu_main'), reply_markup=main_menu_keyboard())
     await call.answer()
 
@@ -541,7 +560,12 @@ async def cb_expand_back(call: types.CallbackQuery, state: FSMContext):
 async def cb_menu_export(call: types.CallbackQuery):
     kb = types.InlineKeyboardMarkup(row_width=1)
     kb.add(
-        types.InlineKeyboardButton("📤 Общий результат", callback_data="export_all"),
+        types.InlineKeyboardButton("📤 Общий результат (CSV)", callback_data="export_all"),
+        types.InlineKeyboardButton("📊 Общий результат (Excel)", callback_data="export_all_xlsx"),
+        types.InlineKeyboardButton("🆕 Новые с прошлой выгрузки (CSV)", callback_data="export_new"),
+        types.InlineKeyboardButton("🆕 Новые с прошлой выгрузки (Excel)", callback_data="export_new_xlsx"),
+        types.InlineKeyboardButton("🔎 Выгрузка с фильтром", callback_data="export_filter"),
+        types.InlineKeyboardButton("♻️ Сбросить отметку выгрузки", callback_data="export_reset"),
         types.InlineKeyboardButton("📂 Выбрать парсер", callback_data="export_choose"),
         types.InlineKeyboardButton("🔔 Моментальные уведомления", callback_data="export_alert"),
         types.InlineKeyboardButton("🔙 Назад", callback_data="back_main"),
@@ -550,9 +574,112 @@ async def cb_menu_export(call: types.CallbackQuery):
     await call.answer()
 
 
-@dp.callback_query_handler(lambda c: c.data == 'export_all')
+@dp.callback_query_handler(lambda c: c.data in ('export_all', 'export_all_xlsx'))
 async def cb_export_all(call: types.CallbackQuery):
-    await send_all_results(call.from_user.id)
+    fmt = 'xlsx' if call.data == 'export_all_xlsx' else 'csv'
+    await start_export(call.from_user.id, send_all_results(call.from_user.id, fmt))
+    await ui_from_callback_edit(call, t('menu_main'), reply_markup=main_menu_keyboard())
+    await call.answer()
+
+
+@dp.callback_query_handler(lambda c: c.data in ('export_new', 'export_new_xlsx'))
+async def cb_export_new(call: types.CallbackQuery):
+    fmt = 'xlsx' if call.data == 'export_new_xlsx' else 'csv'
+    await start_export(call.from_user.id, send_all_results(call.from_user.id, fmt, new_only=True))
+    await ui_from_callback_edit(call, t('menu_main'), reply_markup=main_menu_keyboard())
+    await call.answer()
+
+
+@dp.callback_query_handler(lambda c: c.data == 'export_reset')
+async def cb_export_reset(call: types.CallbackQuery):
+    reset_export_cursors(call.from_user.id)
+    await call.answer(t('export_cursor_reset'), show_alert=True)
+
+
+def parse_period(text: str) -> dict | None:
+    """«-», «ДД.ММ.ГГГГ» или «ДД.ММ.ГГГГ-ДД.ММ.ГГГГ» -> фильтр по дате, None при ошибке."""
+    text = text.strip()
+    if text == '-':
+        return {}
+    parts = [p.strip() for p in text.split('-')]
+    if len(parts) == 1:
+        parts = parts * 2
+    if len(parts) != 2:
+        return None
+    try:
+        start, end = (datetime.strptime(p, '%d.%m.%Y') for p in parts)
+    except ValueError:
+        return None
+    if end < start:
+        return None
+    # date_to не включается: результаты до конца последнего дня
+    return {
+        'date_from': start.strftime('%Y-%m-%d'),
+        'date_to': (end + timedelta(days=1)).strftime('%Y-%m-%d'),
+    }
+
+
+@dp.callback_query_handler(lambda c: c.data == 'export_filter')
+async def cb_export_filter(call: types.CallbackQuery, state: FSMContext):
+    await ui_from_callback_edit(
+        call,
+        "Введите период в формате ДД.ММ.ГГГГ-ДД.ММ.ГГГГ (или одну дату).\n"
+        "Отправьте «-», чтобы не ограничивать период.",
+    )
+    await ExportStates.waiting_period.set()
+    await call.answer()
+
+
+@dp.message_handler(state=ExportStates.waiting_period)
+async def export_filter_period(message: types.Message, state: FSMContext):
+    filters = parse_period(message.text or '')
+    if filters is None:
+        await ui_send_new(message.from_user.id, "Неверный формат. Пример: 01.03.2024-31.03.2024 или «-».")
+        return
+    await state.update_data(filters=filters)
+    await ExportStates.waiting_keyword.set()
+    await ui_send_new(message.from_user.id, "Введите ключевое слово (как в настройках парсера) или «-» для всех:")
+
+
+@dp.message_handler(state=ExportStates.waiting_keyword)
+async def export_filter_keyword(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    filters = data.get('filters', {})
+    keyword = (message.text or '').strip()
+    if keyword and keyword != '-':
+        filters['keyword'] = keyword
+    await state.update_data(filters=filters)
+    await ExportStates.waiting_chat.set()
+    await ui_send_new(message.from_user.id, "Введите название чата (как в выгрузке) или «-» для всех:")
+
+
+@dp.message_handler(state=ExportStates.waiting_chat)
+async def export_filter_chat(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    filters = data.get('filters', {})
+    chat = (message.text or '').strip()
+    if chat and chat != '-':
+        filters['chat'] = chat
+    await state.update_data(filters=filters)
+    await ExportStates.waiting_format.set()
+    kb = types.InlineKeyboardMarkup(row_width=2)
+    kb.add(
+        types.InlineKeyboardButton("CSV", callback_data="export_filtered_csv"),
+        types.InlineKeyboardButton("Excel", callback_data="export_filtered_xlsx"),
+    )
+    await ui_send_new(message.from_user.id, "Выберите формат файла:", reply_markup=kb)
+
+
+@dp.callback_query_handler(
+    lambda c: c.data in ('export_filtered_csv', 'export_filtered_xlsx'),
+    state=ExportStates.waiting_format,
+)
+async def cb_export_filtered(call: types.CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    await state.finish()
+    fmt = 'xlsx' if call.data == 'export_filtered_xlsx' else 'csv'
+    user_id = call.from_user.id
+    await start_export(user_id, send_all_results(user_id, fmt, filters=data.get('filters')))
     await ui_from_callback_edit(call, t('menu_main'), reply_markup=main_menu_keyboard())
     await call.answer()
 
@@ -562,6 +689,18 @@ async def cb_export_choose(call: types.CallbackQuery):
     await cb_result(call)
 
 
+@dp.callback_query_handler(lambda c: c.data == 'notify_retry')
+async def cb_notify_retry(call: types.CallbackQuery):
+    user_id = call.from_user.id
+    if bot2:
+        # the user says they started the notifications bot: try it right away
+        mark_reachable(bot2, user_id)
+    if await redeliver_notifications(user_id):
+        await call.answer(t('notify_redelivered'), show_alert=True)
+    else:
+        await call.answer(t('notify_still_unreachable'), show_alert=True)
+
+
 @dp.callback_query_handler(lambda c: c.data == 'export_alert')
 async def cb_export_alert(call: types.CallbackQuery):
     link = f"https://t.me/topgraber_yved_bot"
@@ -845,9 +984,12 @@ async def cb_result(call: types.CallbackQuery):
     kb = types.InlineKeyboardMarkup(row_width=1)
     for idx, p in enumerate(data.get('parsers'), 1):
         name = p.get('name', f'Парсер {idx}')
-        kb.add(types.InlineKeyboardButton(name, callback_data=f"csv_{idx}"))
+        kb.row(
+            types.InlineKeyboardButton(f"{name} · CSV", callback_data=f"csv_{idx}"),
+            types.InlineKeyboardButton("Excel", callback_data=f"xlsx_{idx}"),
+        )
     kb.add(types.InlineKeyboardButton("🔙 Назад", callback_data="back_main"))
-    await ui_from_callback_edit(call, "Выберите парсер для получения CSV:", reply_markup=kb)
+    await ui_from_callback_edit(call, "Выберите парсер для получения CSV или Excel:", reply_markup=kb)
     await call.answer()
 
 
@@ -879,9 +1021,10 @@ async def cb_active_parsers(call: types.CallbackQuery):
     await call.answer()
 
 
-@dp.callback_query_handler(lambda c: c.data.startswith('csv_'))
+@dp.callback_query_handler(lambda c: c.data.startswith(('csv_', 'xlsx_')))
 async def cb_send_csv(call: types.CallbackQuery):
-    idx = int(call.data.split('_')[1]) - 1
+    fmt, idx = call.data.split('_')
+    idx = int(idx) - 1
     user_id = call.from_user.id
     check_subscription(user_id)
     data = user_data.get(str(user_id))
@@ -895,26 +1038,12 @@ async def cb_send_csv(call: types.CallbackQuery):
         await call.answer()
         return
     parser = parsers[idx]
-    results = parser.get('results', [])
-    if not results:
+    await wait_for_writes()
+    if not has_results(export_ranges([parser])):
         await ui_from_callback_edit(call, "Нет сохранённых результатов для этого парсера.")
         await call.answer()
         return
-    path = f"results_{user_id}_{idx + 1}.csv"
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(["keyword", "chat", "sender", "datetime", "link", "text"])
-        for r in results:
-            writer.writerow([
-                r.get('keyword', ''),
-                r.get('chat', ''),
-                r.get('sender', ''),
-                r.get('datetime', ''),
-                r.get('link', ''),
-                r.get('text', '').replace('\n', ' '),
-            ])
-    await bot.send_document(user_id, types.InputFile(path))
-    os.remove(path)
+    await start_export(user_id, send_results(user_id, [parser], f"results_{user_id}_{idx + 1}", fmt=fmt))
     await ui_from_callback_edit(call, t('menu_main'), reply_markup=main_menu_keyboard())
     await call.answer()
 
@@ -922,7 +1051,8 @@ async def cb_send_csv(call: types.CallbackQuery):
 @dp.message_handler(commands=['export'])
 async def cmd_export(message: types.Message):
     check_subscription(message.from_user.id)
-    await send_all_results(message.from_user.id)
+    new_only = message.get_args().strip() == 'new'
+    await start_export(message.from_user.id, send_all_results(message.from_user.id, new_only=new_only))
 
 
 @dp.message_handler(commands=['check_payment'])
@@ -1040,7 +1170,6 @@ async def cmd_add_parser(message: types.Message, state: FSMContext):
         'chats': [],
         'keywords': [],
         'exclude_keywords': [],
-        'results': [],
         'status': 'paused',
         'daily_price': 0.0,
     }
@@ -1406,19 +1535,11 @@ async def _process_chats(message: types.Message, state: FSMContext, next_state):
     parts = [p for p in text.split() if p]
     user_id = message.from_user.id
     client = user_clients[user_id]['client']
-    chat_ids = []
-
-    for part in parts:
-        try:
-            entity = await client.get_entity(part)
-            chat_ids.append(entity.id)
-        except Exception:
-            if part.lstrip("-").isdigit():
-                chat_ids.append(int(part))
-            else:
-                await ui_send_new(user_id,
-                    "⚠️ Чат не найден. Проверьте доступность в аккаунте и корректность ссылки.")
-                return None
+    chat_ids = await resolve_chat_ids(user_id, client, parts)
+    if chat_ids is None:
+        await ui_send_new(user_id,
+            "⚠️ Чат не найден. Проверьте доступность в аккаунте и корректность ссылки.")
+        return None
 
     if not chat_ids:
         await ui_send_new(user_id, "⚠️ Пустой список. Введите хотя бы одну ссылку или ID:")
@@ -1473,7 +1594,6 @@ async def _process_keywords(message: types.Message, state: FSMContext):
         'chats': chat_ids,
         'keywords': keywords,
         'exclude_keywords': [],
-        'results': [],
     }
     info = user_clients.setdefault(user_id, {})
     info.setdefault('parsers', []).append(parser)
@@ -1510,17 +1630,10 @@ async def edit_chats_handler(message: types.Message, state: FSMContext):
     parts = [p for p in text.split() if p]
     user_id = message.from_user.id
     client = user_clients[user_id]['client']
-    chat_ids = []
-    for part in parts:
-        try:
-            entity = await client.get_entity(part)
-            chat_ids.append(entity.id)
-        except Exception:
-            if part.lstrip("-").isdigit():
-                chat_ids.append(int(part))
-            else:
-                await ui_send_new(user_id, "⚠️ Чат не найден. Проверьте доступность и корректность ссылки.")
-                return
+    chat_ids = await resolve_chat_ids(user_id, client, parts)
+    if chat_ids is None:
+        await ui_send_new(user_id, "⚠️ Чат не найден. Проверьте доступность и корректность ссылки.")
+        return
     if not chat_ids:
         await ui_send_new(user_id, "⚠️ Пустой список. Введите хотя бы одну ссылку или ID:")
         return
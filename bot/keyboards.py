@@ -34,6 +34,9 @@ def parser_settings_keyboard(idx: int) -> types.InlineKeyboardMarkup:
         types.InlineKeyboardButton("📂 Изменить слова", callback_data=f"edit_keywords_{idx}"),
         types.InlineKeyboardButton("📂 Изменить искл-слова", callback_data=f"edit_exclude_{idx}"),
     )
+    kb.add(
+        types.InlineKeyboardButton("📬 Уведомления: сводкой / сразу", callback_data=f"parser_digest_{idx}"),
+    )
     kb.add(
         types.InlineKeyboardButton("🗑 Удалить (только на паузе)", callback_data=f"parser_delete_{idx}"),
     )
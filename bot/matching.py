@@ -0,0 +1,117 @@
+import re
+from collections import deque
+
+from .text_utils import normalize_word
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> list[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def normalize_tokens(text: str) -> list[str]:
+    """Normalized token sequence of ``text`` (phrase order is kept)."""
+    return [normalize_word(w) for w in tokenize(text)]
+
+
+class PhraseAutomaton:
+    """Aho–Corasick automaton whose alphabet is normalized tokens.
+
+    Every pattern is a tuple of normalized words, so single keywords and
+    multi-word phrases are all found in one linear scan of a message.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+    def add(self, phrase: tuple[str, ...], value):
+        state = 0
+        for token in phrase:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (value,)
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(token, 0)
+                self._fail[nxt] = fail
+                # outputs of the longest proper suffix are reported as well
+                self._out[nxt] = self._out[nxt] + self._out[fail]
+        return self
+
+    def iter_matches(self, tokens):
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                yield from out[state]
+
+
+def _phrase(text: str) -> tuple[str, ...]:
+    return tuple(normalize_tokens(text))
+
+
+class KeywordMatcher:
+    """Keyword/exclude phrases of a parser, compiled once when it starts."""
+
+    _EXCLUDE = -1
+
+    def __init__(self, keywords, exclude=()):
+        self.keywords = list(keywords or [])
+        # normalized phrase -> original keywords, in the order the user gave them
+        self.forms = {}
+        self.exclude = set()
+        self.automaton = PhraseAutomaton()
+        for pos, kw in enumerate(self.keywords):
+            phrase = _phrase(kw)
+            if not phrase:
+                continue
+            if phrase not in self.forms:
+                self.automaton.add(phrase, pos)
+            self.forms.setdefault(phrase, []).append(kw)
+        for word in exclude or []:
+            phrase = _phrase(word)
+            if phrase and phrase not in self.exclude:
+                self.exclude.add(phrase)
+                self.automaton.add(phrase, self._EXCLUDE)
+        self.automaton.build()
+
+    def match_tokens(self, tokens) -> str | None:
+        """Return the first keyword found in normalized ``tokens``."""
+        best = None
+        for pos in self.automaton.iter_matches(tokens):
+            if pos == self._EXCLUDE:
+                return None
+            if best is None or pos < best:
+                best = pos
+        return None if best is None else self.keywords[best]
+
+    def match(self, text: str) -> str | None:
+        return self.match_tokens(normalize_tokens(text))
+
+
+def match_parsers(tokens, entries):
+    """Yield ``(parser, keyword)`` for every ``(parser, matcher)`` entry hitting ``tokens``."""
+    for parser, matcher in entries:
+        kw = matcher.match_tokens(tokens)
+        if kw is not None:
+            yield parser, kw
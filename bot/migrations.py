@@ -0,0 +1,62 @@
+"""Versioned upgrades of stored user records.
+
+Each record carries ``schema_version``; ``migrate_user`` runs the steps
+between that version and ``SCHEMA_VERSION`` in order. The functions only
+touch the dicts they are given, so old ``user_data.json`` files can be
+upgraded with ``migrate_data(json.load(f))`` outside the bot.
+"""
+from .config import CHAT_LIMIT
+from .pricing import calc_parser_daily_cost
+
+SCHEMA_VERSION = 1
+
+
+def _v1_defaults(user: dict):
+    # the defaults load_user_data used to apply on every start
+    user.setdefault('subscription_expiry', 0)
+    user.setdefault('recurring', False)
+    user.setdefault('reminder3_sent', False)
+    user.setdefault('reminder1_sent', False)
+    user.setdefault('inactive_notified', False)
+    user.setdefault('used_promos', [])
+    user.setdefault('chat_limit', CHAT_LIMIT)
+    user.setdefault('balance', 0.0)
+    user.setdefault('billing_enabled', True)
+    for p in user.get('parsers', []):
+        p.setdefault('name', 'Без названия')
+        p.setdefault('api_id', '')
+        p.setdefault('api_hash', '')
+        p.setdefault('status', 'paused')
+        p.setdefault('daily_price', 0.0)
+        if not p.get('daily_price'):
+            p['daily_price'] = calc_parser_daily_cost(p)
+
+
+# (version the step upgrades to, step)
+MIGRATIONS = [
+    (1, _v1_defaults),
+]
+
+
+def migrate_user(user: dict) -> bool:
+    """Upgrade one record in place; returns whether anything ran."""
+    version = user.get('schema_version', 0)
+    if version >= SCHEMA_VERSION:
+        return False
+    for target, step in MIGRATIONS:
+        if target > version:
+            step(user)
+    user['schema_version'] = SCHEMA_VERSION
+    return True
+
+
+def migrate_data(data: dict) -> int:
+    """Upgrade every record of a ``user_data`` dict; returns how many changed."""
+    return sum(migrate_user(user) for user in data.values())
+
+
+def new_user() -> dict:
+    """A record for a first-time user, already at ``SCHEMA_VERSION``."""
+    user = {}
+    migrate_user(user)
+    return user
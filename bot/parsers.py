@@ -1,18 +1,71 @@
-import re
 import html
 import asyncio
-import os
-import csv
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime
-from telethon import events
+from tempfile import SpooledTemporaryFile
+from aiogram import types
+from telethon import events, utils as tl_utils, types as tl_types
 
-from .config import bot, bot2, CHAT_LIMIT
-from .text_utils import normalize_word, t
-from .data import user_data, save_user_data, get_user_data_entry
-from .utils import safe_send_message
-from .billing import calc_parser_daily_cost
+from .config import (
+    bot,
+    bot2,
+    CHAT_LIMIT,
+    EXPORT_JOBS_PER_USER,
+    EXPORT_PROGRESS_ROWS,
+    EXPORT_SPOOL_SIZE,
+    EXPORT_WORKERS,
+    EXPORT_PART_SIZE,
+    EXPORT_ZIP_SIZE,
+    DIGEST_HITS,
+    DIGEST_SECONDS,
+    DIGEST_MAX_LENGTH,
+    NOTIFY_BACKLOG_SIZE,
+    NOTIFY_REMIND_INTERVAL,
+    NOTIFY_RETRY_INTERVAL,
+)
+from .text_utils import t
+from .matching import KeywordMatcher, match_parsers, normalize_tokens
+from .records import Result
+from .export import FORMATS, write_csv_zip_parts
+from .data import (
+    user_data,
+    save_user_data,
+    get_user_data_entry,
+    append_result,
+    clear_results,
+    count_results,
+    export_ranges,
+    has_results,
+    measure_results,
+    iter_results,
+    open_reader,
+    parser_uid,
+    wait_for_writes,
+)
+from .utils import is_unreachable, safe_send_message
+from .delivery import BULK, deliver
+from .entities import get_entity_cache
+from .pricing import calc_parser_daily_cost
 
 user_clients = {}
+# export files are built here, never on the event loop
+_export_pool = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+# user_id -> exports queued or running via start_export
+export_jobs = {}
+export_tasks = set()
+# parser uid -> hits waiting to be sent as one message, see _queue_digest
+digests = {}
+notify_tasks = set()
+# user_id -> exports in send_results, which write back to parser dicts
+exporting = {}
+# user_id -> hits the notifications bot could not deliver, see _notify
+undelivered = {}
+# user_id -> time.time() of the last "start the notifications bot" reminder
+reminded = {}
 
 
 def parser_info_text(user_id: int, parser: dict, created: bool = False) -> str:
@@ -29,8 +82,9 @@ def parser_info_text(user_id: int, parser: dict, created: bool = False) -> str:
     else:
         paid_to = '—'
     chat_limit = f"/{data.get('chat_limit', CHAT_LIMIT)}" if plan_name == 'PRO' else ''
-    status_emoji = '🟢' if parser.get('handler') else '⏸'
-    status_text = 'Активен' if parser.get('handler') else 'Остановлен'
+    monitored = is_monitored(user_id, parser)
+    status_emoji = '🟢' if monitored else '⏸'
+    status_text = 'Активен' if monitored else 'Остановлен'
     if created:
         return t('parser_created', id=idx)
     return t(
@@ -49,6 +103,236 @@ def parser_info_text(user_id: int, parser: dict, created: bool = False) -> str:
     )
 
 
+def _chat_keys(chat_id: int) -> set[int]:
+    """Marked ids an event's ``chat_id`` can have for a stored chat id.
+
+    Mirrors how ``events.NewMessage(chats=...)`` expands plain ids.
+    """
+    if chat_id < 0:
+        return {chat_id}
+    return {
+        tl_utils.get_peer_id(tl_types.PeerUser(chat_id)),
+        tl_utils.get_peer_id(tl_types.PeerChat(chat_id)),
+        tl_utils.get_peer_id(tl_types.PeerChannel(chat_id)),
+    }
+
+
+def _route(info: dict, parser: dict, matcher: KeywordMatcher):
+    entry = (parser, matcher)
+    info.setdefault('monitored', {})[id(parser)] = entry
+    routes = info.setdefault('routes', {})
+    # the bare and the marked id of one chat share keys, add the entry once
+    keys = {key for chat_id in parser.get('chats', []) for key in _chat_keys(int(chat_id))}
+    for key in keys:
+        routes.setdefault(key, []).append(entry)
+
+
+def _unroute(info: dict, parser: dict):
+    if info.get('monitored', {}).pop(id(parser), None) is None:
+        return
+    routes = info.get('routes', {})
+    for key in list(routes):
+        routed = [e for e in routes[key] if e[0] is not parser]
+        if routed:
+            routes[key] = routed
+        else:
+            del routes[key]
+
+
+def _keep_loaded(user_id: str) -> bool:
+    # running monitors and exports hold this user's parser dicts
+    user_id = int(user_id)
+    return user_id in user_clients or user_id in exporting
+
+
+user_data.keep = _keep_loaded
+
+
+def is_monitored(user_id: int, parser: dict) -> bool:
+    info = user_clients.get(user_id) or {}
+    return id(parser) in info.get('monitored', {})
+
+
+async def _notify(user_id: int, message_text: str):
+    """Send a hit via the notifications bot, or keep it until the user can get it."""
+    pending = undelivered.get(user_id)
+    if pending is None and bot2:
+        if await safe_send_message(bot2, user_id, message_text, parse_mode="HTML", priority=BULK):
+            return
+        if not is_unreachable(bot2, user_id):
+            # flood limit, network or markup error, already logged: the user
+            # can still get the next hit
+            return
+        pending = undelivered[user_id] = {'items': deque(maxlen=NOTIFY_BACKLOG_SIZE), 'sending': False}
+    if pending is not None:
+        pending['items'].append(message_text)
+    now = time.time()
+    if now - reminded.get(user_id, 0) < NOTIFY_REMIND_INTERVAL:
+        return
+    reminded[user_id] = now
+    kb = types.InlineKeyboardMarkup()
+    kb.add(types.InlineKeyboardButton(t('notify_bot_started'), callback_data="notify_retry"))
+    await safe_send_message(bot, user_id, t('notify_bot_reminder'), reply_markup=kb, priority=BULK)
+
+
+async def redeliver_notifications(user_id: int) -> bool:
+    """Send the hits kept for ``user_id``; True once none are left.
+
+    Hits are joined into as few messages as fit Telegram's length limit.
+    Delivery stops while the user is unreachable, the rest stay for the next
+    try. A batch failing for another reason is resent hit by hit, and a hit
+    that still fails is dropped so it can't hold up the backlog.
+    """
+    pending = undelivered.get(user_id)
+    if pending is None:
+        return True
+    if not bot2 or pending['sending']:
+        return False
+    items = pending['items']
+    pending['sending'] = True
+    one_by_one = False
+    try:
+        while items:
+            batch, length = [items[0]], len(items[0])
+            while not one_by_one and len(batch) < len(items):
+                item = items[len(batch)]
+                if length + 2 + len(item) > DIGEST_MAX_LENGTH:
+                    break
+                batch.append(item)
+                length += 2 + len(item)
+            text = "\n\n".join(batch)
+            sent = await safe_send_message(bot2, user_id, text, parse_mode="HTML", priority=BULK)
+            if not sent:
+                if is_unreachable(bot2, user_id):
+                    return False
+                if len(batch) > 1:
+                    one_by_one = True
+                    continue
+                logging.warning(f"Dropping undeliverable notification for {user_id}")
+            # hits queued meanwhile may have pushed some of the batch out
+            # of the full deque already
+            for item in batch:
+                if items and items[0] is item:
+                    items.popleft()
+        del undelivered[user_id]
+        return True
+    finally:
+        pending['sending'] = False
+
+
+async def notify_retry_loop():
+    """Periodically retry hits the notifications bot could not deliver."""
+    while True:
+        await asyncio.sleep(NOTIFY_RETRY_INTERVAL)
+        for user_id in list(undelivered):
+            try:
+                await redeliver_notifications(user_id)
+            except Exception as e:
+                logging.error(f"Redelivery to {user_id} failed: {e}")
+
+
+def _queue_digest(user_id: int, parser: dict, message_text: str):
+    """Buffer a hit of a parser in digest mode.
+
+    The digest is sent after ``digest_hits`` hits or ``digest_seconds``
+    seconds, whichever comes first, or earlier if the next hit would not fit
+    into one Telegram message.
+    """
+    uid = parser_uid(parser)
+    digest = digests.get(uid)
+    if digest and digest['length'] + len(message_text) > DIGEST_MAX_LENGTH:
+        _flush_digest(uid)
+        digest = None
+    if digest is None:
+        seconds = parser.get('digest_seconds', DIGEST_SECONDS)
+        digest = digests[uid] = {
+            'user_id': user_id,
+            'name': parser.get('name', ''),
+            'items': [],
+            # room for the header
+            'length': 200,
+            'timer': asyncio.get_running_loop().call_later(seconds, _flush_digest, uid),
+        }
+    digest['items'].append(message_text)
+    digest['length'] += len(message_text) + 2
+    if len(digest['items']) >= parser.get('digest_hits', DIGEST_HITS):
+        _flush_digest(uid)
+
+
+def _flush_digest(uid: str):
+    digest = digests.pop(uid, None)
+    if not digest:
+        return
+    digest['timer'].cancel()
+    items = digest['items']
+    header = t('digest_header').format(count=len(items), name=html.escape(digest['name']))
+    task = asyncio.create_task(_notify(digest['user_id'], "\n\n".join([header, *items])))
+    notify_tasks.add(task)
+    task.add_done_callback(notify_tasks.discard)
+
+
+async def flush_all_digests():
+    """Send every pending digest and wait for the notifications, e.g. at shutdown."""
+    for uid in list(digests):
+        _flush_digest(uid)
+    if notify_tasks:
+        await asyncio.gather(*notify_tasks, return_exceptions=True)
+
+
+async def _handle_hit(user_id: int, parser: dict, kw: str, event, sender, chat, text: str):
+    sender = sender or {}
+    chat = chat or {}
+    title = chat.get('title') or str(event.chat_id)
+    username = sender.get('username')
+    sender_name = f"@{username}" if username else sender.get('first_name') or 'Unknown'
+    msg_time = event.message.date.strftime('%Y-%m-%d %H:%M:%S')
+    link = 'Ссылка недоступна'
+    chat_username = chat.get('username')
+    if chat_username:
+        link = f"https://t.me/{chat_username}/{event.id}"
+    preview = html.escape(text[:400])
+    message_text = (
+        f"🔔 Найдено '{html.escape(kw)}' в чате '{html.escape(title)}'\n"
+        f"Username: {html.escape(sender_name)}\n"
+        f"DateTime: {msg_time}\n"
+        f"Link: {html.escape(link)}\n"
+        f"<pre>{preview}</pre>"
+    )
+    # stored first: the notification may wait in the outbox for a while
+    append_result(parser, Result(kw, title, sender_name, msg_time, link, text))
+    if parser.get('notify_mode') == 'digest':
+        _queue_digest(user_id, parser, message_text)
+    else:
+        await _notify(user_id, message_text)
+
+
+def _make_dispatcher(user_id: int, info: dict):
+    """One NewMessage handler per client, routing by chat id to parsers."""
+
+    async def dispatch(event):
+        routed = info.get('routes', {}).get(event.chat_id)
+        if not routed:
+            return
+        text = event.raw_text or ''
+        if not text:
+            return
+        # tokenized and normalized once for every parser of this user
+        tokens = normalize_tokens(text)
+        hits = list(match_parsers(tokens, routed))
+        if not hits:
+            return
+        # only candidate hits pay for resolving the sender and the chat
+        entities = get_entity_cache(user_id)
+        sender = await entities.sender(event)
+        if sender and sender['bot']:
+            return
+        chat = await entities.chat(event)
+        for parser, kw in hits:
+            await _handle_hit(user_id, parser, kw, event, sender, chat, text)
+
+    return dispatch
+
+
 async def start_monitor(user_id: int, parser: dict):
     if parser.get('status', 'paused') != 'active':
         return
@@ -58,76 +342,38 @@ async def start_monitor(user_id: int, parser: dict):
     client = info['client']
     chat_ids = parser.get('chats')
     keywords = parser.get('keywords')
-    exclude = [normalize_word(w) for w in parser.get('exclude_keywords', [])]
     if not chat_ids or not keywords:
         return
-
-    event_builder = events.NewMessage(chats=chat_ids)
-
-    async def monitor(event, keywords=keywords, parser=parser):
-        sender = await event.get_sender()
-        if getattr(sender, 'bot', False):
-            return
-        text = event.raw_text or ''
-        words = [normalize_word(w) for w in re.findall(r'\w+', text.lower())]
-        for kw in keywords:
-            if normalize_word(kw) in words and not any(e in words for e in exclude):
-                chat = await event.get_chat()
-                title = getattr(chat, 'title', str(event.chat_id))
-                username = getattr(sender, 'username', None)
-                sender_name = f"@{username}" if username else getattr(sender, 'first_name', 'Unknown')
-                msg_time = event.message.date.strftime('%Y-%m-%d %H:%M:%S')
-                link = 'Ссылка недоступна'
-                chat_username = getattr(chat, 'username', None)
-                if chat_username:
-                    link = f"https://t.me/{chat_username}/{event.id}"
-                preview = html.escape(text[:400])
-                message_text = (
-                    f"🔔 Найдено '{html.escape(kw)}' в чате '{html.escape(title)}'\n"
-                    f"Username: {html.escape(sender_name)}\n"
-                    f"DateTime: {msg_time}\n"
-                    f"Link: {html.escape(link)}\n"
-                    f"<pre>{preview}</pre>"
-                )
-                if not bot2 or await safe_send_message(bot2, user_id, message_text, parse_mode="HTML") is None:
-                    await safe_send_message(
-                        bot,
-                        user_id,
-                        "Пожалуйста, начните чат с ботом уведомлений сначала: https://t.me/topgraber_yved_bot",
-                    )
-                parser.setdefault('results', []).append({
-                    'keyword': kw,
-                    'chat': title,
-                    'sender': sender_name,
-                    'datetime': msg_time,
-                    'link': link,
-                    'text': text,
-                })
-                save_user_data(user_data)
-                break
-
-    client.add_event_handler(monitor, event_builder)
-    parser['handler'] = monitor
-    parser['event'] = event_builder
+    _unroute(info, parser)
+    _route(info, parser, KeywordMatcher(keywords, parser.get('exclude_keywords', [])))
+    if 'handler' not in info:
+        info['handler'] = _make_dispatcher(user_id, info)
+        info['event'] = events.NewMessage()
+        client.add_event_handler(info['handler'], info['event'])
     if not client.is_connected():
         await client.connect()
     if 'task' not in info:
         info['task'] = asyncio.create_task(client.run_until_disconnected())
 
 
+def flush_digest(parser: dict):
+    """Send what a parser has buffered in digest mode right away."""
+    _flush_digest(parser.get('uid'))
+
+
 def stop_monitor(user_id: int, parser: dict):
+    flush_digest(parser)
     info = user_clients.get(user_id)
     if not info:
         return
-    handler = parser.get('handler')
-    event = parser.get('event')
-    if handler and event:
+    _unroute(info, parser)
+    if not info.get('routes') and 'handler' in info:
         try:
-            info['client'].remove_event_handler(handler, event)
+            info['client'].remove_event_handler(info['handler'], info['event'])
         except Exception:
             pass
-    parser.pop('handler', None)
-    parser.pop('event', None)
+        info.pop('handler', None)
+        info.pop('event', None)
 
 
 def pause_parser(user_id: int, parser: dict):
@@ -143,59 +389,218 @@ async def resume_parser(user_id: int, parser: dict):
     await start_monitor(user_id, parser)
 
 
-async def send_all_results(user_id: int):
+# most a CSV row adds to its fields: commas, quotes around every field, CRLF
+CSV_ROW_OVERHEAD = 2 * len(Result._fields) + len(Result._fields) - 1 + 2
+
+
+def _build_export(fmt: str, ranges, filters, progress, upload):
+    # runs on the export pool, so it reads through its own connection;
+    # ``upload(f, part)`` blocks until the finished file is sent
+    files = []
+
+    def new_file():
+        files.append(SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE))
+        return files[-1]
+
+    try:
+        with closing(open_reader()) as reader:
+            if fmt == 'csv':
+                total, size = measure_results(ranges, reader, filters)
+                zipped = size + total * CSV_ROW_OVERHEAD > EXPORT_ZIP_SIZE
+            else:
+                total, zipped = count_results(ranges, reader, filters), False
+            rows = _with_progress(iter_results(ranges, reader, filters), total, progress)
+            if zipped:
+                write_csv_zip_parts(rows, EXPORT_PART_SIZE, new_file, upload)
+            else:
+                f = new_file()
+                FORMATS[fmt](f, rows)
+                upload(f, None)
+    finally:
+        for f in files:
+            f.close()
+
+
+def _with_progress(rows, total: int, progress):
+    if total <= EXPORT_PROGRESS_ROWS:
+        yield from rows
+        return
+    for done, row in enumerate(rows, 1):
+        yield row
+        if done % EXPORT_PROGRESS_ROWS == 0:
+            progress(done, total)
+
+
+async def _show_progress(status, done: int, total: int):
+    try:
+        text = t('export_progress').format(done=done, total=total)
+        await deliver(bot, status.chat.id, lambda: status.edit_text(text))
+    except Exception:
+        logging.debug("Failed to update export progress", exc_info=True)
+
+
+async def send_results(
+    chat_id: int,
+    parsers,
+    name: str,
+    caption: str = None,
+    fmt: str = 'csv',
+    new_only: bool = False,
+    filters: dict = None,
+):
+    """Build ``name.<fmt>`` from storage on the export pool and upload it.
+
+    The file is kept in memory up to EXPORT_SPOOL_SIZE and only then spills to
+    an anonymous temporary file, which is removed however the upload ends;
+    nothing is written to the working directory. CSV exports estimated over
+    EXPORT_ZIP_SIZE are sent as zip archives of at most EXPORT_PART_SIZE
+    bytes each, every part uploaded as soon as it is complete. Once an
+    unfiltered export is sent each parser's ``export_cursor`` moves to the
+    last result it contained. Returns the ranges that were sent.
+    """
+    loop = asyncio.get_running_loop()
+    parsers = list(parsers)
+    ranges = export_ranges(parsers, new_only)
+    status = await safe_send_message(bot, chat_id, t('export_preparing'))
+
+    def progress(done, total):
+        if status is not None:
+            asyncio.run_coroutine_threadsafe(_show_progress(status, done, total), loop)
+
+    async def send_file(f, part):
+        if part is None:
+            filename, part_caption = f"{name}.{fmt}", caption
+        else:
+            filename = f"{name}.part{part}.zip"
+            part_caption = t('export_part').format(part=part)
+
+        # one InputFile for every attempt: it closes ``f`` once collected
+        document = types.InputFile(f, filename=filename)
+
+        def send_document():
+            # the outbox calls this again after RetryAfter, so rewind each time
+            f.seek(0)
+            return bot.send_document(chat_id, document, caption=part_caption)
+
+        await deliver(bot, chat_id, send_document)
+
+    def upload(f, part):
+        asyncio.run_coroutine_threadsafe(send_file(f, part), loop).result()
+
+    exporting[chat_id] = exporting.get(chat_id, 0) + 1
+    try:
+        await loop.run_in_executor(_export_pool, _build_export, fmt, ranges, filters, progress, upload)
+        if not filters:
+            for parser, (_, _, upto) in zip(parsers, ranges):
+                parser['export_cursor'] = max(parser.get('export_cursor', 0), upto)
+            save_user_data(user_data)
+        return ranges
+    finally:
+        exporting[chat_id] -= 1
+        if not exporting[chat_id]:
+            del exporting[chat_id]
+        if status is not None:
+            try:
+                await status.delete()
+            except Exception:
+                pass
+
+
+def _export_done(user_id: int, task: asyncio.Task):
+    export_tasks.discard(task)
+    export_jobs[user_id] -= 1
+    if not export_jobs[user_id]:
+        del export_jobs[user_id]
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("Export failed for %s", user_id, exc_info=task.exception())
+        notice = asyncio.create_task(safe_send_message(bot, user_id, t('export_failed')))
+        notify_tasks.add(notice)
+        notice.add_done_callback(notify_tasks.discard)
+
+
+async def start_export(user_id: int, job) -> bool:
+    """Run export coroutine ``job`` in the background so the handler can return.
+
+    A user may have at most EXPORT_JOBS_PER_USER exports queued or running;
+    past that the job is dropped and the user is asked to wait.
+    """
+    if export_jobs.get(user_id, 0) >= EXPORT_JOBS_PER_USER:
+        job.close()
+        await safe_send_message(bot, user_id, t('export_busy'))
+        return False
+    export_jobs[user_id] = export_jobs.get(user_id, 0) + 1
+    task = asyncio.create_task(job)
+    export_tasks.add(task)
+    task.add_done_callback(lambda task: _export_done(user_id, task))
+    return True
+
+
+async def send_all_results(user_id: int, fmt: str = 'csv', new_only: bool = False, filters: dict = None):
     data = user_data.get(str(user_id))
     if not data:
         return
-    rows = []
-    for parser in data.get('parsers', []):
-        for r in parser.get('results', []):
-            rows.append([
-                r.get('keyword', ''),
-                r.get('chat', ''),
-                r.get('sender', ''),
-                r.get('datetime', ''),
-                r.get('link', ''),
-                r.get('text', '').replace('\n', ' '),
-            ])
-    if not rows:
-        await safe_send_message(bot, user_id, t('no_results'))
+    parsers = data.get('parsers', [])
+    await wait_for_writes()
+    if not has_results(export_ranges(parsers, new_only), filters):
+        if filters:
+            text = t('no_filtered_results')
+        else:
+            text = t('no_new_results' if new_only else 'no_results')
+        await safe_send_message(bot, user_id, text)
+        return
+    if filters:
+        name = f"results_{user_id}_filtered"
+    else:
+        name = f"results_{user_id}_{'new' if new_only else 'all'}"
+    return await send_results(
+        user_id, parsers, name, caption=t('csv_export_ready'), fmt=fmt, new_only=new_only, filters=filters
+    )
+
+
+def reset_export_cursors(user_id: int):
+    """Make the next "new since last export" include every result again."""
+    data = user_data.get(str(user_id))
+    if not data:
         return
-    path = f"results_{user_id}_all.csv"
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(["keyword", "chat", "sender", "datetime", "link", "text"])
-        writer.writerows(rows)
-    from aiogram import types
-    await bot.send_document(user_id, types.InputFile(path), caption=t('csv_export_ready'))
-    os.remove(path)
+    for parser in data.get('parsers', []):
+        parser.pop('export_cursor', None)
+    save_user_data(user_data)
 
 
-async def send_parser_results(user_id: int, idx: int):
+async def send_parser_results(user_id: int, idx: int, fmt: str = 'csv'):
     data = user_data.get(str(user_id))
     if not data:
         return
     parsers = data.get('parsers', [])
     if idx < 0 or idx >= len(parsers):
         return
-    parser = parsers[idx]
-    results = parser.get('results', [])
-    if not results:
+    await _send_parser(user_id, parsers[idx], idx + 1, fmt)
+
+
+async def _send_parser(user_id: int, parser: dict, number: int, fmt: str = 'csv'):
+    await wait_for_writes()
+    if not has_results(export_ranges([parser])):
         await safe_send_message(bot, user_id, t('no_results'))
         return
-    path = f"results_{user_id}_{idx + 1}.csv"
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(["keyword", "chat", "sender", "datetime", "link", "text"])
-        for r in results:
-            writer.writerow([
-                r.get('keyword', ''),
-                r.get('chat', ''),
-                r.get('sender', ''),
-                r.get('datetime', ''),
-                r.get('link', ''),
-                r.get('text', '').replace('\n', ' '),
-            ])
-    from aiogram import types
-    await bot.send_document(user_id, types.InputFile(path))
-    os.remove(path)
+    await send_results(user_id, [parser], f"results_{user_id}_{number}", fmt=fmt)
+
+
+async def send_and_clear_results(user_id: int):
+    """Export job for /clear_result: send every result, then delete what was sent."""
+    ranges = await send_all_results(user_id)
+    if ranges:
+        # results found while the table was built were not in it, keep them
+        clear_results(ranges)
+
+
+async def send_and_delete_parser(user_id: int, parser: dict, number: int):
+    """Export job for deleting a parser: send its results, then remove it."""
+    stop_monitor(user_id, parser)
+    await _send_parser(user_id, parser, number)
+    data = user_data.get(str(user_id))
+    parsers = data.get('parsers', []) if data else []
+    # the list may have changed while the file was built
+    if any(p is parser for p in parsers):
+        parsers.remove(parser)
+        save_user_data(user_data)
+        await safe_send_message(bot, user_id, t('parser_deleted'))
@@ -3,9 +3,10 @@ import uuid
 from yookassa import Payment
 
 from .config import YOOKASSA_SHOP_ID, YOOKASSA_TOKEN, RETURN_URL, PRO_MONTHLY_RUB, bot
-from .data import get_user_data_entry, save_user_data, user_data
+from .data import get_user_data_entry, save_user_data, user_data, record_payment, update_payment_status
 from .text_utils import t
 from .billing import _round2
+from .delivery import PAYMENT
 from .utils import safe_send_message
 
 
@@ -49,6 +50,7 @@ def create_payment(user_id: int, amount: str, description: str, user_email: str
             },
             str(uuid.uuid4()),
         )
+        record_payment(payment.id, user_id, amount, description)
         return payment.id, payment.confirmation.confirmation_url
     except Exception:
         return None, None
@@ -67,17 +69,17 @@ async def wait_topup_and_credit(user_id: int, payment_id: str, amount: float):
             data['balance'] = _round2(float(data.get('balance', 0)) + amount)
             data.pop('payment_id', None)
             save_user_data(user_data)
-            await safe_send_message(bot, user_id, f"✅ Оплата прошла. Баланс пополнен на {amount:.2f} ₽.")
+            await safe_send_message(bot, user_id, f"✅ Оплата прошла. Баланс пополнен на {amount:.2f} ₽.", priority=PAYMENT)
             return
         if status in ('canceled', 'expired'):
             data = get_user_data_entry(user_id)
             data.pop('payment_id', None)
             save_user_data(user_data)
-            await safe_send_message(bot, user_id, t('payment_failed', status=status))
+            await safe_send_message(bot, user_id, t('payment_failed', status=status), priority=PAYMENT)
             return
         from asyncio import sleep
         await sleep(5)
-    await safe_send_message(bot, user_id, t('payment_failed', status='timeout'))
+    await safe_send_message(bot, user_id, t('payment_failed', status='timeout'), priority=PAYMENT)
 
 
 def create_pro_payment(user_id: int):
@@ -87,6 +89,7 @@ def create_pro_payment(user_id: int):
 def check_payment(payment_id: str):
     try:
         payment = Payment.find_one(payment_id)
+        update_payment_status(payment_id, payment.status)
         return payment.status
     except Exception:
         return None
@@ -102,14 +105,14 @@ async def wait_payment_and_activate(user_id: int, payment_id: str, chats: int):
             data['chat_limit'] = chats
             data.pop('payment_id', None)
             save_user_data(user_data)
-            await safe_send_message(bot, user_id, t('payment_success'))
+            await safe_send_message(bot, user_id, t('payment_success'), priority=PAYMENT)
             return
         if status in ('canceled', 'expired'):
             data = get_user_data_entry(user_id)
             data.pop('payment_id', None)
             save_user_data(user_data)
-            await safe_send_message(bot, user_id, t('payment_failed', status=status))
+            await safe_send_message(bot, user_id, t('payment_failed', status=status), priority=PAYMENT)
             return
         from asyncio import sleep
         await sleep(5)
-    await safe_send_message(bot, user_id, t('payment_failed', status='timeout'))
+    await safe_send_message(bot, user_id, t('payment_failed', status='timeout'), priority=PAYMENT)
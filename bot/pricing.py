@@ -0,0 +1,13 @@
+"""Parser prices; kept free of bot.data imports so migrations can use them."""
+from .config import PRO_MONTHLY_RUB, EXTRA_CHAT_MONTHLY_RUB, DAYS_IN_MONTH
+
+
+def _round2(x: float) -> float:
+    return float(f"{x:.2f}")
+
+
+def calc_parser_daily_cost(parser: dict) -> float:
+    chats = len(parser.get('chats', []))
+    base = PRO_MONTHLY_RUB / DAYS_IN_MONTH
+    extras = max(0, chats - 5) * (EXTRA_CHAT_MONTHLY_RUB / DAYS_IN_MONTH)
+    return _round2(base + extras)
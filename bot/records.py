@@ -0,0 +1,29 @@
+from typing import NamedTuple
+
+
+class Result(NamedTuple):
+    """One found message, stored as a row of the ``results`` table.
+
+    A tuple with named fields: no per-instance dict, and the row read back
+    from SQLite is used as-is.
+    """
+
+    keyword: str = ''
+    chat: str = ''
+    sender: str = ''
+    datetime: str = ''
+    link: str = ''
+    text: str = ''
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Result":
+        """Convert a result in the legacy ``parser['results']`` format."""
+        return cls(*(data.get(f, '') for f in cls._fields))
+
+    def to_dict(self) -> dict:
+        return self._asdict()
+
+
+def result_row(cursor, row) -> Result:
+    """sqlite3 ``row_factory`` producing Result records."""
+    return Result._make(row)
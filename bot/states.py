@@ -40,3 +40,10 @@ class TopUpStates(StatesGroup):
 
 class PartnerTransferStates(StatesGroup):
     waiting_amount = State()
+
+
+class ExportStates(StatesGroup):
+    waiting_period = State()
+    waiting_keyword = State()
+    waiting_chat = State()
+    waiting_format = State()
@@ -0,0 +1,425 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections.abc import MutableMapping
+
+from .records import Result, result_row
+
+RESULT_FIELDS = Result._fields
+INSERT_RESULT = f"INSERT INTO results (parser_uid, {', '.join(RESULT_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parsers (
+    uid TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS parsers_user ON parsers(user_id, position);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parser_uid TEXT NOT NULL,
+    keyword TEXT,
+    chat TEXT,
+    sender TEXT,
+    datetime TEXT,
+    link TEXT,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS results_parser ON results(parser_uid, id);
+-- export filters, see _filter_sql
+CREATE INDEX IF NOT EXISTS results_parser_datetime ON results(parser_uid, datetime);
+CREATE INDEX IF NOT EXISTS results_parser_keyword ON results(parser_uid, keyword);
+CREATE INDEX IF NOT EXISTS results_parser_chat ON results(parser_uid, chat);
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    amount TEXT,
+    description TEXT,
+    status TEXT,
+    created_at INTEGER,
+    updated_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS payments_user ON payments(user_id);
+"""
+
+
+def parser_uid(parser: dict) -> str:
+    """Stable id of a parser, used as its row key and to link its results."""
+    return parser.setdefault('uid', uuid.uuid4().hex)
+
+
+def _id_column(filters) -> str:
+    # unary + keeps SQLite from picking the id index over the datetime one
+    if filters and (filters.get('date_from') or filters.get('date_to')):
+        return "+id"
+    return "id"
+
+
+def _filter_sql(filters) -> tuple[str, list]:
+    """SQL conditions for export ``filters``.
+
+    ``date_from``/``date_to`` bound the ``datetime`` column
+    ('YYYY-MM-DD HH:MM:SS', so text order is time order), ``date_to``
+    exclusive; ``keyword`` and ``chat`` match exactly.
+    """
+    sql = ""
+    params = []
+    if not filters:
+        return sql, params
+    if filters.get('date_from'):
+        sql += " AND datetime >= ?"
+        params.append(filters['date_from'])
+    if filters.get('date_to'):
+        sql += " AND datetime < ?"
+        params.append(filters['date_to'])
+    for column in ('keyword', 'chat'):
+        if filters.get(column):
+            sql += f" AND {column} = ?"
+            params.append(filters[column])
+    return sql, params
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+class SQLiteStore:
+    """user_data kept in SQLite (WAL) with row-level writes.
+
+    ``prepare`` compares each user and parser row with a hash of what was
+    last written and only emits writes for rows that changed; ``apply`` runs
+    those writes in one transaction. Results never live in ``user_data``:
+    they are appended straight to the ``results`` table and streamed back.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # writes may come from the write-behind thread, see data.py
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # reads use their own connection and never see a half-applied write
+        self.reader = self.open_reader()
+        self._users = {}
+        self._parsers = {}
+        self._retry = []
+
+    def open_reader(self) -> sqlite3.Connection:
+        """A new read-only connection, e.g. for a worker thread."""
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+    def schema_version(self) -> int:
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def user_ids(self) -> list[str]:
+        rows = self.reader.execute("SELECT user_id FROM users UNION SELECT user_id FROM parsers")
+        return [user_id for (user_id,) in rows]
+
+    def active_user_ids(self) -> list[str]:
+        """Users with a parser stored as active."""
+        rows = self.reader.execute(
+            "SELECT DISTINCT user_id FROM parsers WHERE json_extract(data, '$.status') = 'active'"
+        )
+        return [user_id for (user_id,) in rows]
+
+    def forget(self, user_ids):
+        """Drop the row digests of records no longer held in memory."""
+        user_ids = set(user_ids)
+        for user_id in user_ids:
+            self._users.pop(user_id, None)
+        for uid, row in list(self._parsers.items()):
+            if row[0] in user_ids:
+                del self._parsers[uid]
+
+    def load_user(self, user_id: str) -> dict | None:
+        """Read one user record with its parsers, or ``None`` if unknown."""
+        row = self.reader.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        parsers = self.reader.execute(
+            "SELECT uid, position, data FROM parsers WHERE user_id = ? ORDER BY position", (user_id,)
+        ).fetchall()
+        if row is None and not parsers:
+            return None
+        user = {}
+        if row is not None:
+            user = json.loads(row[0])
+            self._users[user_id] = hash(row[0])
+        user['parsers'] = []
+        for uid, position, blob in parsers:
+            user['parsers'].append(json.loads(blob))
+            self._parsers[uid] = (user_id, position, hash(blob))
+        return user
+
+    def prepare(self, users, deleted_users=()) -> list:
+        """Diff ``users`` against the last written rows and return the SQL to run.
+
+        Only the given user records are compared, so records that were never
+        loaded cost nothing. May run in the writer thread while the event
+        loop keeps changing the records: each record and parser is copied or
+        dumped in a single C call, so it is read in one consistent state.
+        """
+        ops = []
+        seen_users = set()
+        seen_parsers = set()
+        for user_id, user in users.items():
+            seen_users.add(user_id)
+            fields = dict(user)
+            parsers = list(fields.pop('parsers', None) or ())
+            blob = _dumps(fields)
+            digest = hash(blob)
+            if self._users.get(user_id) != digest:
+                ops.append(("INSERT OR REPLACE INTO users (user_id, data) VALUES (?, ?)", (user_id, blob)))
+                self._users[user_id] = digest
+            for position, parser in enumerate(parsers):
+                uid = parser_uid(parser)
+                seen_parsers.add(uid)
+                self._prepare_parser(ops, user_id, position, parser)
+        for uid, (user_id, _, _) in list(self._parsers.items()):
+            if user_id in seen_users and uid not in seen_parsers:
+                ops.append(("DELETE FROM parsers WHERE uid = ?", (uid,)))
+                ops.append(("DELETE FROM results WHERE parser_uid = ?", (uid,)))
+                del self._parsers[uid]
+        for user_id in deleted_users:
+            ops.append(("DELETE FROM results WHERE parser_uid IN (SELECT uid FROM parsers WHERE user_id = ?)", (user_id,)))
+            ops.append(("DELETE FROM parsers WHERE user_id = ?", (user_id,)))
+            ops.append(("DELETE FROM users WHERE user_id = ?", (user_id,)))
+            self._users.pop(user_id, None)
+            for uid, row in list(self._parsers.items()):
+                if row[0] == user_id:
+                    del self._parsers[uid]
+        return ops
+
+    def _prepare_parser(self, ops: list, user_id: str, position: int, parser: dict):
+        uid = parser['uid']
+        # runtime monitor state lives in user_clients, so parsers dump as-is
+        blob = _dumps(parser)
+        row = (user_id, position, hash(blob))
+        if self._parsers.get(uid) != row:
+            ops.append((
+                "INSERT OR REPLACE INTO parsers (uid, user_id, position, data) VALUES (?, ?, ?, ?)",
+                (uid, user_id, position, blob),
+            ))
+            self._parsers[uid] = row
+
+    def apply(self, ops: list):
+        """Run prepared operations in one transaction.
+
+        Operations of a failed transaction are kept and retried first on
+        the next call, so no change is lost to a transient error.
+        """
+        ops = self._retry + ops
+        self._retry = []
+        if not ops:
+            return
+        try:
+            with self.conn:
+                for sql, params in ops:
+                    self.conn.execute(sql, params)
+        except Exception:
+            self._retry = ops
+            raise
+
+    def save(self, data: dict):
+        self.apply(self.prepare(data))
+
+    def append_result(self, parser_uid: str, result: Result):
+        with self.conn:
+            self.conn.execute(INSERT_RESULT, (parser_uid, *result))
+
+    def clear_results(self, parser_uid: str, upto: int = None):
+        """Delete a parser's results, only those up to id ``upto`` if given."""
+        with self.conn:
+            if upto is None:
+                self.conn.execute("DELETE FROM results WHERE parser_uid = ?", (parser_uid,))
+            else:
+                self.conn.execute("DELETE FROM results WHERE parser_uid = ? AND id <= ?", (parser_uid, upto))
+
+    def last_result_id(self, parser_uid: str) -> int:
+        row = self.reader.execute("SELECT MAX(id) FROM results WHERE parser_uid = ?", (parser_uid,)).fetchone()
+        return row[0] or 0
+
+    # ``ranges`` are (parser uid, after id, up to id) triples: the results
+    # with after < id <= up to, see data.export_ranges
+
+    def has_results(self, ranges, filters=None) -> bool:
+        where, params = _filter_sql(filters)
+        id_ = _id_column(filters)
+        sql = f"SELECT 1 FROM results WHERE parser_uid = ? AND {id_} > ? AND {id_} <= ?{where} LIMIT 1"
+        return any(self.reader.execute(sql, (*r, *params)).fetchone() for r in ranges)
+
+    def count_results(self, ranges, reader: sqlite3.Connection = None, filters=None) -> int:
+        reader = reader or self.reader
+        where, params = _filter_sql(filters)
+        id_ = _id_column(filters)
+        sql = f"SELECT COUNT(*) FROM results WHERE parser_uid = ? AND {id_} > ? AND {id_} <= ?{where}"
+        return sum(reader.execute(sql, (*r, *params)).fetchone()[0] for r in ranges)
+
+    def measure_results(self, ranges, reader: sqlite3.Connection = None, filters=None) -> tuple[int, int]:
+        """Row count and UTF-8 bytes of the result fields, counting '"' twice as CSV does."""
+        reader = reader or self.reader
+        where, params = _filter_sql(filters)
+        id_ = _id_column(filters)
+        fields = " || ".join(f"IFNULL({field}, '')" for field in RESULT_FIELDS)
+        size = f"LENGTH(CAST({fields} AS BLOB)) + LENGTH({fields}) - LENGTH(REPLACE({fields}, '\"', ''))"
+        sql = (
+            f"SELECT COUNT(*), IFNULL(SUM({size}), 0) FROM results"
+            f" WHERE parser_uid = ? AND {id_} > ? AND {id_} <= ?{where}"
+        )
+        count = size = 0
+        for r in ranges:
+            rows, nbytes = reader.execute(sql, (*r, *params)).fetchone()
+            count += rows
+            size += nbytes
+        return count, size
+
+    def iter_results(
+        self,
+        parser_uid: str,
+        reader: sqlite3.Connection = None,
+        after: int = 0,
+        upto: int = None,
+        filters=None,
+    ):
+        """Stream results of a parser, oldest first, as Result records."""
+        cursor = (reader or self.reader).cursor()
+        cursor.row_factory = result_row
+        id_ = _id_column(filters)
+        sql = f"SELECT {', '.join(RESULT_FIELDS)} FROM results WHERE parser_uid = ? AND {id_} > ?"
+        params = [parser_uid, after]
+        if upto is not None:
+            sql += f" AND {id_} <= ?"
+            params.append(upto)
+        where, filter_params = _filter_sql(filters)
+        return cursor.execute(sql + where + " ORDER BY id", params + filter_params)
+
+    def record_payment(self, payment_id: str, user_id, amount: str, description: str):
+        now = int(time.time())
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO payments "
+                "(payment_id, user_id, amount, description, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                (payment_id, str(user_id), amount, description, now, now),
+            )
+
+    def update_payment_status(self, payment_id: str, status: str):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE payments SET status = ?, updated_at = ? WHERE payment_id = ? AND status IS NOT ?",
+                (status, int(time.time()), payment_id, status),
+            )
+
+    def migrate_json(self, json_path: str) -> bool:
+        """Import a legacy user_data.json into an empty database once."""
+        if not os.path.exists(json_path) or not self.is_empty():
+            return False
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        results = {}
+        for user in data.values():
+            for parser in user.get('parsers', []):
+                results[parser_uid(parser)] = parser.pop('results', [])
+        # users, parsers and results commit together: a crash part way leaves
+        # the database empty and the import runs again on the next start
+        try:
+            with self.conn:
+                for sql, params in self.prepare(data):
+                    self.conn.execute(sql, params)
+                for uid, rows in results.items():
+                    self.conn.executemany(
+                        INSERT_RESULT,
+                        [(uid, *Result.from_dict(r)) for r in rows],
+                    )
+        except Exception:
+            # prepare() recorded rows that were rolled back
+            self._users.clear()
+            self._parsers.clear()
+            raise
+        os.replace(json_path, json_path + ".migrated")
+        logging.info("Migrated %d users from %s to %s", len(data), json_path, self.path)
+        return True
+
+
+class UserRepository(MutableMapping):
+    """``user_data`` mapping that loads user records on first access.
+
+    Only the set of known user ids is read at startup; a record is read
+    from the store the first time it is looked up, then stays in ``loaded``
+    until ``evict`` drops it. ``keep(user_id)``, if set, tells records that
+    must stay loaded because something outside still holds them.
+    Records are already upgraded by the migration runner, see migrations.py.
+    """
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+        self.loaded = {}
+        self.deleted = set()
+        self.keep = None
+        # user_id -> monotonic time of the last lookup
+        self.accessed = {}
+        self._index = set(store.user_ids())
+
+    def __getitem__(self, user_id):
+        self.accessed[user_id] = time.monotonic()
+        user = self.loaded.get(user_id)
+        if user is None:
+            if user_id not in self._index:
+                raise KeyError(user_id)
+            user = self.store.load_user(user_id)
+            if user is None:
+                raise KeyError(user_id)
+            self.loaded[user_id] = user
+        return user
+
+    def __setitem__(self, user_id, user):
+        self.accessed[user_id] = time.monotonic()
+        self._index.add(user_id)
+        self.deleted.discard(user_id)
+        self.loaded[user_id] = user
+
+    def __delitem__(self, user_id):
+        if user_id not in self._index:
+            raise KeyError(user_id)
+        self._index.discard(user_id)
+        self.loaded.pop(user_id, None)
+        self.accessed.pop(user_id, None)
+        self.deleted.add(user_id)
+
+    def __contains__(self, user_id):
+        return user_id in self._index
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __len__(self):
+        return len(self._index)
+
+    def pop_deleted(self) -> set:
+        deleted, self.deleted = self.deleted, set()
+        return deleted
+
+    def evict(self, before: float) -> list:
+        """Drop loaded records last looked up before ``before``; returns their ids.
+
+        Only call this right after the loaded records were written, an
+        evicted record is read back from the store on the next lookup.
+        """
+        evicted = [
+            user_id for user_id in self.loaded
+            if self.accessed.get(user_id, 0) < before and not (self.keep and self.keep(user_id))
+        ]
+        for user_id in evicted:
+            del self.loaded[user_id]
+            self.accessed.pop(user_id, None)
+        return evicted
@@ -2,21 +2,37 @@ import re
 import json
 from pymorphy3 import MorphAnalyzer
 import snowballstemmer
-from .config import TEXT_FILE
+from .config import TEXT_FILE, NORMALIZE_CACHE_SIZE
+from .cache import LRUCache
 
 morph = MorphAnalyzer()
 stemmer_en = snowballstemmer.stemmer("english")
+normalize_cache = LRUCache(NORMALIZE_CACHE_SIZE)
+CYRILLIC_RE = re.compile("[а-яА-Я]")
 
 with open(TEXT_FILE, "r", encoding="utf-8") as f:
     TEXTS = json.load(f)
 
 
+def _normalize_uncached(word: str) -> str:
+    if CYRILLIC_RE.search(word):
+        return morph.parse(word)[0].normal_form
+    return stemmer_en.stemWord(word)
+
+
 def normalize_word(word: str) -> str:
     """Return normalized form for keyword matching."""
     word = word.lower()
-    if re.search("[а-яА-Я]", word):
-        return morph.parse(word)[0].normal_form
-    return stemmer_en.stemWord(word)
+    normal = normalize_cache.get(word)
+    if normal is None:
+        normal = _normalize_uncached(word)
+        normalize_cache.set(word, normal)
+    return normal
+
+
+def normalize_cache_stats() -> dict:
+    """Return hit/miss/eviction counters of the normalize_word cache."""
+    return normalize_cache.stats()
 
 
 def t(key, **kwargs):
@@ -1,5 +1,7 @@
 import logging
+import time
 from aiogram import Bot, types
+from aiogram.dispatcher.middlewares import BaseMiddleware
 from aiogram.utils.exceptions import (
     MessageNotModified,
     MessageToEditNotFound,
@@ -9,43 +11,88 @@ from aiogram.utils.exceptions import (
     BotBlocked,
 )
 
-from .config import bot
+from .cache import TTLCache
+from .config import bot, RECIPIENT_CACHE_SIZE, RECIPIENT_TTL, RECIPIENT_BLOCKED_TTL
+from .delivery import INTERACTIVE, Dropped, deliver
 from .data import get_user_data_entry, save_user_data, user_data
 from .text_utils import t
 
 
+# recipient_status values
+HUMAN = 'human'
+BOT = 'bot'
+BLOCKED = 'blocked'
+
+# (bot id, user id) -> HUMAN / BOT / BLOCKED. A bot can't message other bots
+# and a user may block one of our bots but not the other, hence the bot id.
+recipient_status = TTLCache(RECIPIENT_CACHE_SIZE, RECIPIENT_TTL)
+
+
+def mark_reachable(bot: Bot, user_id: int):
+    """Forget a blocked status, e.g. once the user writes to ``bot`` again."""
+    recipient_status.set((bot.id, user_id), HUMAN)
+
+
+def is_unreachable(bot: Bot, user_id: int) -> bool:
+    """Whether ``bot`` is known to be unable to message ``user_id``."""
+    return recipient_status.get((bot.id, user_id)) in (BOT, BLOCKED)
+
+
+class RecipientMiddleware(BaseMiddleware):
+    """Anyone sending an update to the main bot can receive messages from it."""
+
+    async def on_pre_process_message(self, message: types.Message, data: dict):
+        if message.chat.type == types.ChatType.PRIVATE:
+            mark_reachable(bot, message.from_user.id)
+
+    async def on_pre_process_callback_query(self, call: types.CallbackQuery, data: dict):
+        mark_reachable(bot, call.from_user.id)
+
+
 async def safe_send_message(
     bot: Bot,
     user_id: int,
     text: str,
     reply_markup=None,
     parse_mode=None,
+    priority: int = INTERACTIVE,
 ) -> types.Message | None:
+    key = (bot.id, user_id)
+    status = recipient_status.get(key)
+    if status in (BOT, BLOCKED):
+        # known unreachable: skip the API call, see RECIPIENT_BLOCKED_TTL
+        return None
     try:
         if reply_markup is None:
             kb = types.InlineKeyboardMarkup()
             kb.add(types.InlineKeyboardButton("🔙 Назад", callback_data="back_main"))
             reply_markup = kb
-        chat = await bot.get_chat(user_id)
-        is_recipient_bot = getattr(chat, "is_bot", False)
-        if is_recipient_bot:
-            logging.warning(f"Skip send: recipient is a bot (user_id={user_id})")
-            return None
+        if status is None:
+            chat = await bot.get_chat(user_id)
+            if getattr(chat, "is_bot", False):
+                recipient_status.set(key, BOT)
+                logging.warning(f"Skip send: recipient is a bot (user_id={user_id})")
+                return None
+            recipient_status.set(key, HUMAN)
 
-        return await bot.send_message(
+        return await deliver(bot, user_id, lambda: bot.send_message(
             user_id,
             text,
             reply_markup=reply_markup,
             parse_mode=parse_mode,
-        )
+        ), priority)
     except (
         Unauthorized,
         CantInitiateConversation,
         ChatNotFound,
         BotBlocked,
     ) as e:
+        recipient_status.set(key, BLOCKED, time.time() + RECIPIENT_BLOCKED_TTL)
         logging.error(f"Cannot send to {user_id}: {e}")
         return None
+    except Dropped as e:
+        logging.warning(f"Dropped message to {user_id}: {e}")
+        return None
     except Exception as e:
         logging.error(f"Unexpected send error to {user_id}: {e}")
         return None
@@ -91,7 +138,11 @@ async def ui_from_callback_edit(
             kb = types.InlineKeyboardMarkup()
             kb.add(types.InlineKeyboardButton("🔙 Назад", callback_data="back_main"))
             reply_markup = kb
-        m = await call.message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        m = await deliver(
+            bot,
+            call.from_user.id,
+            lambda: call.message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode),
+        )
     except (MessageNotModified, MessageToEditNotFound):
         m = await safe_send_message(
             bot,
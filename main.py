@@ -3,12 +3,29 @@ from aiogram.utils import executor
 
 from bot.config import dp
 from bot.billing import daily_billing_loop
+from bot.data import start_write_behind, stop_write_behind
+from bot.parsers import flush_all_digests, notify_retry_loop
+from bot.utils import RecipientMiddleware
+from bot.delivery import close_outboxes
+from bot.entities import entity_save_loop, save_entity_caches
 import bot.handlers  # noqa: F401
 
 
 async def on_startup(dispatcher):
+    start_write_behind()
     asyncio.create_task(daily_billing_loop())
+    asyncio.create_task(notify_retry_loop())
+    asyncio.create_task(entity_save_loop())
+
+
+async def on_shutdown(dispatcher):
+    # before the outboxes close, so the digests still get sent
+    await flush_all_digests()
+    await close_outboxes()
+    await save_entity_caches()
+    await stop_write_behind()
 
 
 if __name__ == "__main__":
-    executor.start_polling(dp, skip_updates=True, on_startup=on_startup)
+    dp.middleware.setup(RecipientMiddleware())
+    executor.start_polling(dp, skip_updates=True, on_startup=on_startup, on_shutdown=on_shutdown)
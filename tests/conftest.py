@@ -0,0 +1,6 @@
+import os
+import sys
+
+# bot.config refuses to import without a token; tests never reach Telegram
+os.environ.setdefault("API_TOKEN", "123456:ABCdefGhIJKlmNoPQRsTUVwxyZ")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
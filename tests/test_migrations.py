@@ -0,0 +1,53 @@
+import copy
+
+from bot.config import CHAT_LIMIT
+from bot.migrations import SCHEMA_VERSION, migrate_data, migrate_user, new_user
+from bot.pricing import calc_parser_daily_cost
+
+# two records as an old user_data.json stored them: no schema_version and
+# only some of the fields later code expects
+LEGACY = {
+    "1": {
+        "balance": 120.5,
+        "parsers": [
+            {"name": "Авто", "chats": ["a", "b", "c", "d", "e", "f"], "keywords": ["шины"]},
+            {"chats": ["a"], "keywords": ["диски"], "daily_price": 10.0, "status": "active"},
+        ],
+    },
+    "2": {"parsers": [], "recurring": True},
+}
+
+
+def test_migrate_data_upgrades_legacy_records():
+    data = copy.deepcopy(LEGACY)
+    assert migrate_data(data) == 2
+
+    first, second = data["1"], data["2"]
+    assert first["schema_version"] == second["schema_version"] == SCHEMA_VERSION
+    assert first["balance"] == 120.5
+    assert first["chat_limit"] == CHAT_LIMIT
+    assert first["used_promos"] == []
+    assert second["recurring"] is True
+    assert second["balance"] == 0.0
+
+    named, unnamed = first["parsers"]
+    assert named["name"] == "Авто"
+    assert named["status"] == "paused"
+    assert named["daily_price"] == calc_parser_daily_cost(named)
+    assert unnamed["name"] == "Без названия"
+    assert unnamed["status"] == "active"
+    assert unnamed["daily_price"] == 10.0
+
+
+def test_migrate_data_is_idempotent():
+    data = copy.deepcopy(LEGACY)
+    migrate_data(data)
+    upgraded = copy.deepcopy(data)
+    assert migrate_data(data) == 0
+    assert data == upgraded
+
+
+def test_new_user_is_current():
+    user = new_user()
+    assert user["schema_version"] == SCHEMA_VERSION
+    assert not migrate_user(user)